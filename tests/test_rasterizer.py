@@ -0,0 +1,41 @@
+#  Copyright (c) 2025.
+#  ProrokLab (https://www.proroklab.org/)
+#  All rights reserved.
+
+import pytest
+import torch
+
+from vmas import make_env
+
+
+@pytest.mark.parametrize("scenario", ["navigation", "buzz_wire", "wheel"])
+def test_render_batch(scenario, n_envs=4, n_steps=3):
+    env = make_env(scenario=scenario, num_envs=n_envs, seed=0)
+    for _ in range(n_steps):
+        env.step(env.get_random_actions())
+
+    frames = env.render_batch()
+    assert frames.shape == (n_envs, *env.scenario.viewer_size[::-1], 3)
+    assert frames.dtype == torch.uint8
+
+    # Rendering a subset gives the same frames as rendering the whole batch
+    subset = env.render_batch(env_index=[2, 0])
+    assert torch.equal(subset[0], frames[2])
+    assert torch.equal(subset[1], frames[0])
+
+
+def test_render_batch_draws_agents(n_envs=2):
+    env = make_env(scenario="navigation", num_envs=n_envs, seed=0, n_agents=1)
+    agent = env.agents[0]
+    agent.set_pos(
+        torch.tensor([[0.5, 0.5], [-0.5, -0.5]], device=env.device), batch_index=None
+    )
+
+    frames = env.render_batch(width=100, height=100, agent_index_focus=0)
+    # The agent is at the center of the focused camera
+    center = frames[:, 50, 50].float()
+    assert (center < 250).any(-1).all()
+    assert (center[0] == center[1]).all()
+
+    frames = env.render_batch(width=120, height=60)
+    assert frames.shape == (n_envs, 60, 120, 3)
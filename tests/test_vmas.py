@@ -6,6 +6,7 @@ import random
 import sys
 from pathlib import Path
 
+import numpy as np
 import pytest
 import torch
 
@@ -320,3 +321,132 @@ def test_seeding():
     env.seed(1)
     env.reset()
     assert random_obs == torch.randn(1)
+
+
+@pytest.mark.skipif(
+    sys.platform.startswith("win32"),
+    reason="Windows on github servers has issues with pyglet",
+)
+def test_render_retains_geometries(n_steps=3):
+    env = make_env(scenario="navigation", num_envs=2, seed=0, n_agents=2)
+    agent = env.agents[0]
+    geoms = None
+    for _ in range(n_steps):
+        env.step(env.get_random_actions())
+        env.render(mode="rgb_array")
+        new_geoms = agent.render(env_index=0)
+        if geoms is not None:
+            assert all(g is new_g for g, new_g in zip(geoms, new_geoms))
+        geoms = new_geoms
+    # The same geometry is moved to the pose of the requested environment
+    geom = agent.render(env_index=1)[0]
+    assert geom is geoms[0]
+    assert geom.attrs[-1].translation == tuple(agent.state.pos[1].tolist())
+
+
+def test_video_writer_sink(tmp_path, n_steps=5):
+    pytest.importorskip("cv2")
+    from vmas.simulator.utils import VideoWriter
+
+    env = make_env(scenario="waterfall", num_envs=2, seed=0)
+    name = str(tmp_path / "waterfall")
+    with VideoWriter(name, fps=10, max_queue_size=2) as video:
+        for _ in range(n_steps):
+            env.step(env.get_random_actions())
+            video.write(env.render_batch(env_index=0, width=64, height=48)[0])
+    assert (tmp_path / "waterfall.mp4").stat().st_size > 0
+
+    import cv2
+
+    capture = cv2.VideoCapture(name + ".mp4")
+    assert int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) == n_steps
+    assert int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)) == 64
+    capture.release()
+
+
+@pytest.mark.skipif(
+    sys.platform.startswith("win32"),
+    reason="Windows on github servers has issues with pyglet",
+)
+def test_render_tiled(n_envs=3):
+    env = make_env(scenario="navigation", num_envs=n_envs, seed=0)
+    env.step(env.get_random_actions())
+
+    frame = env.render_tiled(grid=(2, 2), mode="rgb_array")
+    assert frame.shape == (*env.scenario.viewer_size[::-1], 3)
+    height, width = frame.shape[0] // 2, frame.shape[1] // 2
+    tiles = [
+        frame[row * height : (row + 1) * height, col * width : (col + 1) * width]
+        for row in range(2)
+        for col in range(2)
+    ]
+    # Different environments are drawn in different tiles and the last tile is empty
+    assert not np.array_equal(tiles[0], tiles[1])
+    assert (tiles[3] == tiles[3][0, 0]).all()
+    assert not (tiles[0] == tiles[0][0, 0]).all()
+
+
+@pytest.mark.skipif(
+    sys.platform.startswith("win32"),
+    reason="Windows on github servers has issues with pyglet",
+)
+@pytest.mark.parametrize("batched", [False, True])
+def test_render_function_cache(batched, n_envs=2):
+    env = make_env(scenario="navigation", num_envs=n_envs, seed=0)
+    calls = []
+
+    def f(pos):
+        calls.append(pos)
+        value = (pos**2).sum(-1)
+        if batched:
+            assert isinstance(pos, torch.Tensor)
+            return value.unsqueeze(0).expand(n_envs, -1)
+        return value
+
+    def render(env_index=0, version=0):
+        return env.render(
+            mode="rgb_array",
+            env_index=env_index,
+            plot_position_function=f,
+            plot_position_function_range=1,
+            plot_position_function_precision=0.05,
+            plot_position_function_version=version,
+            plot_position_function_batched=batched,
+        )
+
+    frame = render()
+    assert np.array_equal(render(), frame)
+    assert len(calls) == 1
+    render(env_index=1)
+    assert len(calls) == (1 if batched else 2)
+    render(env_index=1, version=1)
+    assert len(calls) == (2 if batched else 3)
+
+
+def test_collision_mask(n_envs=3, n_agents=4):
+    env = make_env(scenario="navigation", num_envs=n_envs, seed=0, n_agents=n_agents)
+    world = env.world
+    radius = env.agents[0].shape.radius
+    # Agents 0 and 1 touch in the first env, agents 2 and 3 in the last one
+    positions = torch.tensor(
+        [[i * 0.5, 0.0] for i in range(n_agents)], device=env.device
+    ).repeat(n_envs, 1, 1)
+    positions[0, 1] = positions[0, 0] + torch.tensor([radius, radius])
+    positions[-1, 3] = positions[-1, 2] + torch.tensor([2 * radius, 0.0])
+    for i, agent in enumerate(env.agents):
+        agent.set_pos(positions[:, i], batch_index=None)
+
+    mask = world.get_collision_mask()
+    assert mask.shape == (n_envs, n_agents, n_agents)
+    assert torch.equal(mask, mask.transpose(1, 2))
+    assert mask.sum(dim=(1, 2)).tolist() == [2, 0, 2]
+    assert mask[0, 0, 1] and mask[-1, 2, 3]
+
+    # In each env, the mask is what collides finds for that env alone
+    single_env = make_env(scenario="navigation", num_envs=1, seed=0, n_agents=n_agents)
+    for env_index in range(n_envs):
+        for i, agent in enumerate(single_env.agents):
+            agent.set_pos(positions[env_index, i].unsqueeze(0), batch_index=None)
+        for i, a in enumerate(single_env.agents):
+            for j, b in enumerate(single_env.agents):
+                assert single_env.world.collides(a, b) == mask[env_index, i, j]
@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import torch
+from plan_cache import PlanCache
+from path_smoothing import smooth_paths
+from replanning import snap_to_grid
+from helpers import grid_scale_factor
+
+
+def planning_problems(env):
+    """
+    env: VMAS environment
+
+    returns the list of agent indices, and lists with, for each env, the dicts mapping
+    the agents to their start cells and to their goal cells
+    """
+    agents = list(range(len(env.agents)))
+    starts = snap_to_grid(torch.stack([agent.state.pos for agent in env.agents], dim=1))
+    goals = snap_to_grid(torch.stack([agent.goal.state.pos for agent in env.agents], dim=1))
+    return (
+        agents,
+        [{i: tuple(cell) for i, cell in enumerate(cells)} for cells in starts.tolist()],
+        [{i: tuple(cell) for i, cell in enumerate(cells)} for cells in goals.tolist()],
+    )
+
+
+def plan_instance(plan_function, agents, starts, goals, planner_params):
+    """
+    plans one problem, run in a worker process
+    """
+    return plan_function(agents, starts, goals, **planner_params)
+
+
+def plan_envs(plan_function, agents, starts, goals, planner_params, plan_cache=None, n_workers=None):
+    """
+    plan_function: planner called as plan_function(agents, starts, goals, **params), like cbs
+    agents: list of agent indices
+    starts: list with, for each env, the dict mapping the agents to their start cells
+    goals: list with, for each env, the dict mapping the agents to their goal cells
+    planner_params: list with, for each env, the keyword arguments of the planner
+    plan_cache: optional PlanCache, looked up before planning and filled with the new plans
+    n_workers: number of processes planning at once, defaults to the number of cores
+
+    Identical problems, like those of envs sharing their starts and goals, are planned once,
+    and the others in parallel.
+
+    returns the list of the plans of the envs, None for the envs without a plan
+    """
+    keys = [
+        PlanCache.key(env_starts, env_goals, plan_function.__name__, **params)
+        for env_starts, env_goals, params in zip(starts, goals, planner_params)
+    ]
+    plans = {}
+    if plan_cache is not None:
+        for key in set(keys):
+            plan = plan_cache.get(key)
+            if plan is not None:
+                plans[key] = plan
+
+    # first env of each problem left to plan
+    missing = {}
+    for env_index, key in enumerate(keys):
+        if key not in plans:
+            missing.setdefault(key, env_index)
+    problems = {
+        key: (plan_function, agents, starts[env_index], goals[env_index], planner_params[env_index])
+        for key, env_index in missing.items()
+    }
+
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    if len(problems) <= 1 or n_workers <= 1:
+        new_plans = {key: plan_instance(*problem) for key, problem in problems.items()}
+    else:
+        with ProcessPoolExecutor(min(n_workers, len(problems))) as pool:
+            futures = {key: pool.submit(plan_instance, *problem) for key, problem in problems.items()}
+            new_plans = {key: future.result() for key, future in futures.items()}
+
+    for key, plan in new_plans.items():
+        if plan is not None and plan_cache is not None:
+            plan_cache.put(key, plan)
+    plans.update(new_plans)
+    return [plans[key] for key in keys]
+
+
+def pack_plans(plans, agents, starts, goals, n_waypoints=50, device="cpu"):
+    """
+    plans: list of the plans of the envs, None for the envs without a plan
+    agents: list of agent indices
+    starts: list with, for each env, the dict mapping the agents to their start cells
+    goals: list with, for each env, the dict mapping the agents to their goal cells
+    n_waypoints: number of waypoints of each track
+
+    smooths the paths of all the envs at once, the agents of envs without a plan move
+    straight from their start to their goal
+
+    returns the (num_envs, n_agents, n_waypoints, 2) world positions of the waypoints
+    """
+    paths = [
+        plan[agent] if plan is not None else [env_starts[agent], env_goals[agent]]
+        for plan, env_starts, env_goals in zip(plans, starts, goals)
+        for agent in agents
+    ]
+    waypoints, _, _ = smooth_paths(paths, n_waypoints=n_waypoints, device=device)
+    return waypoints.view(len(plans), len(agents), n_waypoints, 2) / grid_scale_factor
@@ -1,124 +1,537 @@
 import heapq
 from collections import deque
+from contextlib import contextmanager
 import math
+import time
+import tracemalloc
+import numpy as np
 from helpers import grid_scale_factor
 
 
 class CBSNode:
-    def __init__(self, constraints, solution, cost):
+    def __init__(self, constraints, solution, cost, constraint_tables, mdds=None):
         self.constraints = constraints  # list: a constraint is a dict {'agent': agent, 'loc': (x, y), 'time': t}
         self.solution = solution        # dict: maps agents to paths
         self.cost = cost                # int: sum of path lengths for all agents combined
+        self.constraint_tables = constraint_tables  # dict: maps agents to their constraint table
+        self.mdds = mdds if mdds is not None else {}  # dict: maps agents to their MDD, built when needed
+        self.conflicts = detect_conflict(solution, all_conflicts=True)  # list: conflicts in the solution
 
     def __lt__(self, other):
-        """Compare nodes based on their cost for priority queue"""
-        return self.cost < other.cost
+        """Compare nodes based on their cost, then on their number of conflicts, for priority queue"""
+        return (self.cost, len(self.conflicts)) < (other.cost, len(other.conflicts))
 
 
-def astar(agent, start, goal, constraints):
+class PlannerStats:
     """
-    A* search that respects vertex and edge constraints for the given agent.
+    Counters and timings of a planning call, filled in by the planners given one.
+    Timings are wall-clock seconds and the low-level search time is included in the total time.
+    """
+
+    def __init__(self):
+        self.nodes_generated = 0          # int: high-level nodes created
+        self.nodes_expanded = 0           # int: high-level nodes popped and branched on
+        self.low_level_expansions = []    # list: nodes expanded by each low-level search
+        self.search_time = 0.0            # float: time in the low-level searches
+        self.conflict_time = 0.0          # float: time detecting conflicts
+        self.classify_time = 0.0          # float: time building MDDs and classifying conflicts
+        self.total_time = 0.0             # float: time of the whole planning call
+        self.open_list_peak = 0           # int: largest size of the high-level open list
+        self.peak_memory = None           # int: peak traced memory in bytes, None if tracemalloc is off
+
+    @contextmanager
+    def timing(self, name):
+        """
+        adds the time spent in the with block to the timing called name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            setattr(self, name, getattr(self, name) + time.perf_counter() - start)
+
+    def update_open_list(self, size):
+        self.open_list_peak = max(self.open_list_peak, size)
+
+    def finish(self, start):
+        """
+        start: time.perf_counter() value at the start of the planning call
+        """
+        self.total_time = time.perf_counter() - start
+        if tracemalloc.is_tracing():
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+
+    def as_dict(self):
+        """
+        returns the statistics as a flat dict, with the low-level expansions summarized
+        """
+        return {
+            'nodes_generated': self.nodes_generated,
+            'nodes_expanded': self.nodes_expanded,
+            'low_level_calls': len(self.low_level_expansions),
+            'low_level_expansions': sum(self.low_level_expansions),
+            'max_low_level_expansions': max(self.low_level_expansions, default=0),
+            'search_time': self.search_time,
+            'conflict_time': self.conflict_time,
+            'classify_time': self.classify_time,
+            'total_time': self.total_time,
+            'open_list_peak': self.open_list_peak,
+            'peak_memory': self.peak_memory,
+        }
+
+
+def build_constraint_table(agent, constraints):
+    """
+    agent: agent index
+    constraints: list of constraints
+
+    returns the constraint table of the agent, a dict with the sets of
+    'vertex' constraints (loc, time) and 'edge' constraints (from, to, time),
+    and the 'goal' constraints {loc: time} forbidding a loc from time on
+    """
+    table = {'vertex': set(), 'edge': set(), 'goal': {}}
+    for c in constraints:
+        if c['agent'] == agent:
+            add_constraint(table, c)
+    return table
+
+
+def add_constraint(table, constraint):
+    """
+    table: constraint table of the agent the constraint belongs to
+    constraint: dict {'agent': agent, 'loc': (x, y) or ((x1, y1), (x2, y2)), 'time': t}
+    """
+    if isinstance(constraint['loc'][0], tuple):
+        table['edge'].add((constraint['loc'][0], constraint['loc'][1], constraint['time']))
+    else:
+        table['vertex'].add((constraint['loc'], constraint['time']))
+
+
+# moves on the grid, including waiting in place
+MOVES = [(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+# grid positions in the order of the flattened grid arrays
+GRID_CELLS = [
+    (float(x), float(y))
+    for x in range(-grid_scale_factor, grid_scale_factor + 1)
+    for y in range(-grid_scale_factor, grid_scale_factor + 1)
+]
+
+
+def on_grid(pos):
+    """
+    returns whether pos is a cell of the grid
+    """
+    return -grid_scale_factor <= pos[0] <= grid_scale_factor and -grid_scale_factor <= pos[1] <= grid_scale_factor
+
+
+def cell_index(pos):
+    """
+    returns the (row, column) index of the grid cell pos in the grid arrays
+    """
+    return round(pos[0]) + grid_scale_factor, round(pos[1]) + grid_scale_factor
+
+
+def distance_map(goal, blocked=None):
+    """
+    goal: goal position
+    blocked: optional boolean array of the grid cells that cannot be entered, indexed by cell_index
+
+    computes the true distances to goal with a breadth-first search from goal
+
+    returns an array indexed by cell_index with the number of moves from each cell to goal,
+    inf where goal cannot be reached
+    """
+    size = 2 * grid_scale_factor + 1
+    free = np.ones((size, size), dtype=bool) if blocked is None else ~blocked
+    distances = np.full((size, size), math.inf)
+    if not on_grid(goal) or not free[cell_index(goal)]:
+        return distances
+
+    frontier = np.zeros((size, size), dtype=bool)
+    frontier[cell_index(goal)] = True
+    distance = 0
+    while frontier.any():
+        distances[frontier] = distance
+        distance += 1
+        # expand the frontier by one move in every direction
+        reached = np.zeros_like(frontier)
+        reached[1:] |= frontier[:-1]
+        reached[:-1] |= frontier[1:]
+        reached[:, 1:] |= frontier[:, :-1]
+        reached[:, :-1] |= frontier[:, 1:]
+        frontier = reached & free & np.isinf(distances)
+    return distances
+
+
+def compute_heuristics(agents, goals, blocked=None):
+    """
+    agents: list of agent indices
+    goals: dict mapping agents to their goal positions
+    blocked: optional boolean array of the grid cells that cannot be entered
+
+    returns a dict mapping agents to the distance map of their goal,
+    computed once and shared by all the searches of a planning call
+    """
+    return {agent: distance_map(goals[agent], blocked) for agent in agents}
+
+
+def heuristic_function(distances):
+    """
+    returns a function giving the distance of a grid position from distances, a distance map
+    """
+    # a dict lookup is faster than indexing the array for single cells
+    table = dict(zip(GRID_CELLS, distances.ravel().tolist()))
+
+    def h(pos):
+        return table.get(pos, math.inf)
+
+    return h
+
+
+def search_limits(goal, constraint_table):
+    """
+    goal: goal position of the agent
+    constraint_table: the agent's constraints, as built by build_constraint_table
+
+    returns the last time the agent is forbidden to be at its goal (-1 if never)
+    and the time after which a path for the agent cannot exist
+    """
+    # the agent stays at its goal after its path ends, so it must not arrive
+    # before the last time the goal is forbidden to it
+    goal_free_after = max((t for loc, t in constraint_table['vertex'] if loc == goal), default=-1)
+
+    # after the last constraint the time does not matter anymore, so a path
+    # that needs more steps than there are cells to visit does not exist
+    last_constraint = max(
+        [t for _, t in constraint_table['vertex']]
+        + [t for _, _, t in constraint_table['edge']]
+        + list(constraint_table['goal'].values()),
+        default=0,
+    )
+    return goal_free_after, last_constraint + (2 * grid_scale_factor + 1) ** 2
+
+
+def astar(start, goal, constraint_table, heuristic=None, stats=None):
+    """
+    Space-time A* search that respects vertex and edge constraints for one agent.
+
+    constraint_table: the agent's constraints, as built by build_constraint_table
+    heuristic: distance map of goal, as built by distance_map. Computed if not given
+    stats: optional PlannerStats recording the expansions and time of the search
+
+    The agent can wait in place, and it only ends its path at the goal once
+    no later vertex constraint forbids it to stay there. Cells from which the goal
+    cannot be reached, like blocked cells, are never entered.
 
     Returns a list of positions [(x1, y1), ...] representing the path,
     or None if no path is found.
     """
-    # --- Pre‑index constraints for O(1) checks ----------------------------
-    vertex_constraints = {
-        (c['loc'], c['time'])
-        for c in constraints
-        if c['agent'] == agent and not isinstance(c['loc'][0], tuple)
-    }
-    edge_constraints = {
-        (c['loc'][0], c['loc'][1], c['time'])
-        for c in constraints
-        if c['agent'] == agent and isinstance(c['loc'][0], tuple)
-    }
+    if stats is None:
+        return _astar(start, goal, constraint_table, heuristic)[0]
+    with stats.timing('search_time'):
+        path, expansions = _astar(start, goal, constraint_table, heuristic)
+    stats.low_level_expansions.append(expansions)
+    return path
 
-    # Manhattan heuristic
-    def h(pos):
-        return abs(pos[0] - goal[0]) + abs(pos[1] - goal[1])
 
-    # (f, g, pos, path)
-    open_list = [(h(start), 0, start, [start])]
-    best_g = {}  # (pos, time) -> g
+def _astar(start, goal, constraint_table, heuristic):
+    """
+    returns the path found by astar and the number of nodes expanded to find it
+    """
+    vertex_constraints = constraint_table['vertex']
+    edge_constraints = constraint_table['edge']
+    goal_constraints = constraint_table['goal']
+    goal_free_after, max_time = search_limits(goal, constraint_table)
+
+    # true distance heuristic
+    if not on_grid(start):
+        return None, 0
+    h = heuristic_function(heuristic if heuristic is not None else distance_map(goal))
+    if h(start) == math.inf:
+        return None, 0
+
+    # a node is (pos, time, parent node), the path is rebuilt from the parents
+    # (f, h, tie breaker, node), ties are broken towards the goal
+    counter = 0
+    open_list = [(h(start), h(start), counter, (start, 0, None))]
+    closed = set()  # (pos, time)
 
     while open_list:
-        f, g, current, path = heapq.heappop(open_list)
-        time = g  # one step = one time unit
+        _, _, _, node = heapq.heappop(open_list)
+        current, time, _ = node
+
+        if (current, time) in closed:
+            continue
+        closed.add((current, time))
 
-        if current == goal:
-            return path
+        if current == goal and time > goal_free_after:
+            path = []
+            while node is not None:
+                path.append(node[0])
+                node = node[2]
+            return path[::-1], len(closed)
 
-        key = (current, time)
-        if key in best_g and g >= best_g[key]:
+        new_time = time + 1
+        if new_time > max_time:
             continue
-        best_g[key] = g
 
-        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+        for dx, dy in MOVES:
             nx, ny = current[0] + dx, current[1] + dy
             next_pos = (nx, ny)
             if not (-grid_scale_factor <= nx <= grid_scale_factor and -grid_scale_factor <= ny <= grid_scale_factor):
                 continue
-            new_time = time + 1
+            if (next_pos, new_time) in closed:
+                continue
 
             # Constraint checks
             if (next_pos, new_time) in vertex_constraints:
                 continue
             if (current, next_pos, new_time) in edge_constraints:
                 continue
+            if next_pos in goal_constraints and new_time >= goal_constraints[next_pos]:
+                continue
 
-            new_g = g + 1
-            new_f = new_g + h(next_pos)
-            heapq.heappush(open_list, (new_f, new_g, next_pos, path + [next_pos]))
+            next_h = h(next_pos)
+            if next_h == math.inf:
+                continue
 
-    return None
+            counter += 1
+            heapq.heappush(open_list, (new_time + next_h, next_h, counter, (next_pos, new_time, node)))
 
+    return None, len(closed)
 
-def detect_conflict(paths):
+
+def paths_to_array(paths):
     """
     paths: dict mapping agents to their paths, where each path is a list of positions
 
-    returns a dict with conflict type ('vertex' or 'edge'), time step, involved agents, and location
+    returns the list of agents and a (N, T, 2) array with their positions over time,
+    where agents that reached their goal keep their last position
     """
+    agents = list(paths)
     max_time = max(len(p) for p in paths.values())
-    for t in range(max_time):
-        pos_at_t = {}
-        for a, path in paths.items():
-            pos = path[min(t, len(path) - 1)]
-            if pos in pos_at_t:
-                return {'type': 'vertex', 'time': t, 'a1': pos_at_t[pos], 'a2': a, 'loc': pos}
-            pos_at_t[pos] = a
-
-        # Check for edge conflict
-        from itertools import combinations
-        for a1, a2 in combinations(paths.keys(), 2):
-            pos1_t = paths[a1][min(t, len(paths[a1]) - 1)]
-            pos1_t1 = paths[a1][min(t + 1, len(paths[a1]) - 1)]
-            pos2_t = paths[a2][min(t, len(paths[a2]) - 1)]
-            pos2_t1 = paths[a2][min(t + 1, len(paths[a2]) - 1)]
-            if pos1_t == pos2_t1 and pos2_t == pos1_t1:
-                return {
-                    'type': 'edge',
-                    'time': t + 1,
-                    'a1': a1,
-                    'a2': a2,
-                    'loc': (pos1_t, pos1_t1)
-                }
-    return None
+    positions = np.empty((len(agents), max_time, 2))
+    for n, agent in enumerate(agents):
+        path = paths[agent]
+        positions[n, :len(path)] = path
+        positions[n, len(path):] = path[-1]
+    return agents, positions
+
+
+def detect_conflict(paths, all_conflicts=False):
+    """
+    paths: dict mapping agents to their paths, where each path is a list of positions
+    all_conflicts: whether to return all conflicts instead of the earliest one
 
+    returns a dict with conflict type ('vertex' or 'edge'), time step, involved agents, and location,
+    or None if there is no conflict.
+    If all_conflicts is True, returns the list of all conflicts ordered by time instead
+    """
+    agents, positions = paths_to_array(paths)
+    # all agent pairs (a1, a2) with a1 before a2
+    first, second = np.triu_indices(len(agents), k=1)
+    pos1, pos2 = positions[first], positions[second]
+
+    # (pair, time) indices of two agents in the same place
+    vertex = np.nonzero((pos1 == pos2).all(-1))
+    # (pair, time) indices of two agents swapping places between time and time + 1
+    moves = (pos1[:, :-1] != pos1[:, 1:]).any(-1)
+    edge = np.nonzero(
+        moves
+        & (pos1[:, :-1] == pos2[:, 1:]).all(-1)
+        & (pos2[:, :-1] == pos1[:, 1:]).all(-1)
+    )
+
+    # sort keys: conflicts between time and time + 1 come after the vertex conflicts at time
+    candidates = [(t, 0, second[pair], first[pair]) for pair, t in zip(*vertex)]
+    candidates += [(t, 1, first[pair], second[pair]) for pair, t in zip(*edge)]
+    if not candidates:
+        return [] if all_conflicts else None
+    if not all_conflicts:
+        candidates = [min(candidates)]
+
+    conflicts = []
+    for t, is_edge, n1, n2 in sorted(candidates):
+        t = int(t)
+        a1, a2 = (agents[n1], agents[n2]) if is_edge else (agents[n2], agents[n1])
+        path1 = paths[a1]
+        if is_edge:
+            conflicts.append({
+                'type': 'edge',
+                'time': t + 1,
+                'a1': a1,
+                'a2': a2,
+                'loc': (path1[min(t, len(path1) - 1)], path1[min(t + 1, len(path1) - 1)])
+            })
+        else:
+            conflicts.append({'type': 'vertex', 'time': t, 'a1': a1, 'a2': a2, 'loc': path1[min(t, len(path1) - 1)]})
+    return conflicts if all_conflicts else conflicts[0]
+
+
+def conflict_constraints(conflict):
+    """
+    conflict: dict as returned by detect_conflict
 
-def compute_solution(agents, constraints, starts, goals):
+    returns the two constraints that resolve the conflict, one for each agent involved
+    """
+    constraints = []
+    for agent in [conflict['a1'], conflict['a2']]:
+        if conflict['type'] == 'vertex':
+            constraints.append({
+                'agent': agent,
+                'loc': conflict['loc'],
+                'time': conflict['time']
+            })
+
+        elif conflict['type'] == 'edge':
+            if agent == conflict['a1']:
+                from_pos, to_pos = conflict['loc']
+            else:
+                to_pos, from_pos = conflict['loc']
+            constraints.append({
+                'agent': agent,
+                'loc': (from_pos, to_pos),
+                'time': conflict['time']
+            })
+    return constraints
+
+
+def constrain_tables(constraint_tables, constraint):
+    """
+    constraint_tables: dict mapping agents to their constraint tables
+    constraint: new constraint
+
+    returns new constraint tables where only the constrained agent's table is copied,
+    the other agents share theirs with constraint_tables
+    """
+    agent = constraint['agent']
+    agent_table = {
+        'vertex': set(constraint_tables[agent]['vertex']),
+        'edge': set(constraint_tables[agent]['edge']),
+        'goal': dict(constraint_tables[agent]['goal']),
+    }
+    add_constraint(agent_table, constraint)
+    new_tables = dict(constraint_tables)
+    new_tables[agent] = agent_table
+    return new_tables
+
+
+def build_mdd(start, goal, cost, constraint_table, heuristic):
+    """
+    Multi-valued decision diagram (MDD) of an agent.
+
+    cost: cost of the agent's paths
+    constraint_table: the agent's constraints, as built by build_constraint_table
+    heuristic: distance map of goal, as built by distance_map
+
+    returns a list with, for each time from 0 to cost, the set of positions the agent
+    can be at on the paths of the given cost from start to goal that respect its constraints
+    """
+    vertex_constraints = constraint_table['vertex']
+    edge_constraints = constraint_table['edge']
+    goal_constraints = constraint_table['goal']
+    h = heuristic_function(heuristic)
+
+    # forward: the moves from which the goal can still be reached in time
+    levels = [{start}]
+    moves = []
+    for t in range(1, cost + 1):
+        level = set()
+        level_moves = set()
+        for current in levels[-1]:
+            for dx, dy in MOVES:
+                next_pos = (current[0] + dx, current[1] + dy)
+                if h(next_pos) > cost - t:
+                    continue
+                if (next_pos, t) in vertex_constraints:
+                    continue
+                if (current, next_pos, t) in edge_constraints:
+                    continue
+                if next_pos in goal_constraints and t >= goal_constraints[next_pos]:
+                    continue
+                level.add(next_pos)
+                level_moves.add((current, next_pos))
+        levels.append(level)
+        moves.append(level_moves)
+
+    # backward: only keep the positions that lead to the goal at time cost
+    mdd = [set() for _ in levels]
+    mdd[cost] = {goal} & levels[cost]
+    for t in range(cost, 0, -1):
+        mdd[t - 1] = {current for current, next_pos in moves[t - 1] if next_pos in mdd[t]}
+    return mdd
+
+
+def get_mdd(node, agent, starts, goals, heuristics):
+    """
+    returns the MDD of agent in node, building it the first time it is needed
+    """
+    if agent not in node.mdds:
+        node.mdds[agent] = build_mdd(
+            starts[agent],
+            goals[agent],
+            len(node.solution[agent]) - 1,
+            node.constraint_tables[agent],
+            heuristics[agent],
+        )
+    return node.mdds[agent]
+
+
+def classify_conflict(conflict, node, starts, goals, heuristics):
+    """
+    conflict: dict as returned by detect_conflict
+    node: CBS node with the conflict
+
+    returns 'cardinal' if solving the conflict increases the cost of both agents,
+    'semi-cardinal' if it increases the cost of one of them and 'non-cardinal' otherwise
+    """
+    cardinal_agents = 0
+    for constraint in conflict_constraints(conflict):
+        mdd = get_mdd(node, constraint['agent'], starts, goals, heuristics)
+        t = constraint['time']
+        # after its path ends the agent stays at its goal
+        if isinstance(constraint['loc'][0], tuple):
+            from_pos, to_pos = constraint['loc']
+            unavoidable = mdd[min(t - 1, len(mdd) - 1)] == {from_pos} and mdd[min(t, len(mdd) - 1)] == {to_pos}
+        else:
+            unavoidable = mdd[min(t, len(mdd) - 1)] == {constraint['loc']}
+        cardinal_agents += unavoidable
+    return ['non-cardinal', 'semi-cardinal', 'cardinal'][cardinal_agents]
+
+
+def choose_conflict(node, starts, goals, heuristics):
+    """
+    returns the conflict of node to branch on: the earliest cardinal conflict,
+    otherwise the earliest semi-cardinal conflict, otherwise the earliest conflict
+    """
+    semi_cardinal = None
+    for conflict in node.conflicts:
+        conflict_type = classify_conflict(conflict, node, starts, goals, heuristics)
+        if conflict_type == 'cardinal':
+            return conflict
+        if conflict_type == 'semi-cardinal' and semi_cardinal is None:
+            semi_cardinal = conflict
+    return semi_cardinal if semi_cardinal is not None else node.conflicts[0]
+
+
+def compute_solution(agents, constraint_tables, starts, goals, heuristics=None, stats=None):
     """
     agents: list of agent indices
-    constraints: list of constraints for the CBS node
+    constraint_tables: dict mapping agents to their constraint tables
     starts: dict mapping agents to their starting positions
     goals: dict mapping agents to their goal positions
+    heuristics: dict mapping agents to their distance maps, as built by compute_heuristics
+    stats: optional PlannerStats recording the searches
 
     returns a dict mapping agents to their paths or None if no solution found
     """
+    if heuristics is None:
+        heuristics = compute_heuristics(agents, goals)
     solution = {}
     for agent in agents:
-        path = astar(agent, starts[agent], goals[agent], constraints)
+        path = astar(starts[agent], goals[agent], constraint_tables[agent], heuristics[agent], stats)
         if not path:
             return None
         solution[agent] = path
@@ -137,60 +550,333 @@ def compute_cost(solution):
     return sum(max(len(path) - 1, 0) for path in solution.values())
 
 
-def cbs(agents, starts, goals):
+def cbs(agents, starts, goals, blocked=None, stats=None):
     """
     agents: list of agent indices
     starts: dict mapping agents to their starting positions
     goals: dict mapping agents to their goal positions
+    blocked: optional boolean array of the grid cells that cannot be entered, see occupancy.occupancy_grid
+    stats: optional PlannerStats filled in with the counters and timings of the search
 
     returns a dict mapping agents to their paths or None if no solution found
     """
+    start_time = time.perf_counter()
+    if stats is None:
+        stats = PlannerStats()
+    solution = _cbs(agents, starts, goals, blocked, stats)
+    stats.finish(start_time)
+    return solution
+
+
+def _cbs(agents, starts, goals, blocked, stats):
+    heuristics = compute_heuristics(agents, goals, blocked)
     root_constraints = []
-    root_solution = compute_solution(agents, root_constraints, starts, goals)
+    root_tables = {agent: build_constraint_table(agent, root_constraints) for agent in agents}
+    root_solution = compute_solution(agents, root_tables, starts, goals, heuristics, stats)
     if root_solution is None:
         # No feasible individual paths – exit early
         return None
     root_cost = compute_cost(root_solution)
-    root = CBSNode(root_constraints, root_solution, root_cost)
+    with stats.timing('conflict_time'):
+        root = CBSNode(root_constraints, root_solution, root_cost, root_tables)
+    stats.nodes_generated += 1
 
     queue = []
     # orders the nodes by cost
     heapq.heappush(queue, root)
+    stats.update_open_list(len(queue))
 
     while queue:
         # pop the node with the lowest cost
         node = heapq.heappop(queue)
-        conflict = detect_conflict(node.solution)
-        if not conflict:
+        if not node.conflicts:
             return node.solution
+        stats.nodes_expanded += 1
+
+        with stats.timing('classify_time'):
+            conflict = choose_conflict(node, starts, goals, heuristics)
 
         # create branches for each agent involved in the conflict
-        for agent in [conflict['a1'], conflict['a2']]:
-            new_constraints = list(node.constraints)
-
-            if conflict['type'] == 'vertex':
-                new_constraints.append({
-                    'agent': agent,
-                    'loc': conflict['loc'],
-                    'time': conflict['time']
-                })
-
-            elif conflict['type'] == 'edge':
-                if agent == conflict['a1']:
-                    from_pos, to_pos = conflict['loc']
-                else:
-                    to_pos, from_pos = conflict['loc']
-                new_constraints.append({
-                    'agent': agent,
-                    'loc': (from_pos, to_pos),
-                    'time': conflict['time']
-                })
-
-            new_solution = compute_solution(agents, new_constraints, starts, goals)
-            if new_solution:
+        children = []
+        for constraint in conflict_constraints(conflict):
+            agent = constraint['agent']
+            new_constraints = node.constraints + [constraint]
+            new_tables = constrain_tables(node.constraint_tables, constraint)
+
+            path = astar(starts[agent], goals[agent], new_tables[agent], heuristics[agent], stats)
+            if path:
+                new_solution = dict(node.solution)
+                new_solution[agent] = path
                 cost = compute_cost(new_solution)
-                new_node = CBSNode(new_constraints, new_solution, cost)
-                heapq.heappush(queue, new_node)
+                # the other agents keep their constraints and paths, so their MDDs are shared
+                mdds = {a: mdd for a, mdd in node.mdds.items() if a != agent}
+                with stats.timing('conflict_time'):
+                    new_node = CBSNode(new_constraints, new_solution, cost, new_tables, mdds)
+                stats.nodes_generated += 1
+
+                # bypass: a path of the same cost with fewer conflicts replaces the parent's one,
+                # it also respects the parent's constraints so no branching is needed
+                if cost == node.cost and len(new_node.conflicts) < len(node.conflicts):
+                    with stats.timing('conflict_time'):
+                        children = [CBSNode(node.constraints, new_solution, cost, node.constraint_tables, node.mdds)]
+                    break
+                children.append(new_node)
+
+        for child in children:
+            heapq.heappush(queue, child)
+        stats.update_open_list(len(queue))
+    return None
+
+
+class ECBSNode(CBSNode):
+    def __init__(self, constraints, solution, cost, constraint_tables, lower_bounds):
+        super().__init__(constraints, solution, cost, constraint_tables)
+        self.lower_bounds = lower_bounds           # dict: maps agents to a lower bound of their path cost
+        self.lower_bound = sum(lower_bounds.values())  # int: lower bound of the optimal cost of the node
+
+
+def build_reservations(paths):
+    """
+    paths: dict mapping agents to their paths
+
+    returns the reservations of the agents: a dict with the number of agents at each
+    (loc, time) as 'vertex', the times at which agents stop at each loc as 'goal'
+    and the number of agents moving along each (from, to, time) as 'edge'
+    """
+    reservations = {'vertex': {}, 'goal': {}, 'edge': {}}
+    for path in paths.values():
+        for t, pos in enumerate(path):
+            reservations['vertex'][(pos, t)] = reservations['vertex'].get((pos, t), 0) + 1
+            if t > 0 and path[t - 1] != pos:
+                edge = (path[t - 1], pos, t)
+                reservations['edge'][edge] = reservations['edge'].get(edge, 0) + 1
+        reservations['goal'].setdefault(path[-1], []).append(len(path) - 1)
+    return reservations
+
+
+def count_conflicts(reservations, current, next_pos, time):
+    """
+    returns the number of conflicts of moving from current to next_pos at time
+    with the agents in reservations, as built by build_reservations
+    """
+    conflicts = reservations['vertex'].get((next_pos, time), 0)
+    conflicts += sum(1 for t in reservations['goal'].get(next_pos, ()) if time > t)
+    conflicts += reservations['edge'].get((next_pos, current, time), 0)
+    return conflicts
+
+
+def focal_astar(start, goal, constraint_table, w, reservations, heuristic=None, stats=None):
+    """
+    Focal search version of astar for ECBS.
+
+    w: suboptimality factor, the path is at most w times longer than the shortest one
+    reservations: the other agents' paths, as built by build_reservations
+    heuristic: distance map of goal, as built by distance_map. Computed if not given
+    stats: optional PlannerStats recording the expansions and time of the search
+
+    Among the nodes with an f value within w times the lowest one, the nodes whose
+    paths have the fewest conflicts with the other agents are expanded first.
+
+    Returns the path and a lower bound on the cost of the shortest path,
+    or (None, None) if no path is found.
+    """
+    if stats is None:
+        return _focal_astar(start, goal, constraint_table, w, reservations, heuristic)[:2]
+    with stats.timing('search_time'):
+        path, lower_bound, expansions = _focal_astar(start, goal, constraint_table, w, reservations, heuristic)
+    stats.low_level_expansions.append(expansions)
+    return path, lower_bound
+
+
+def _focal_astar(start, goal, constraint_table, w, reservations, heuristic):
+    """
+    returns the path and lower bound found by focal_astar and the number of nodes expanded to find them
+    """
+    vertex_constraints = constraint_table['vertex']
+    edge_constraints = constraint_table['edge']
+    goal_constraints = constraint_table['goal']
+    goal_free_after, max_time = search_limits(goal, constraint_table)
+
+    # true distance heuristic
+    if not on_grid(start):
+        return None, None, 0
+    h = heuristic_function(heuristic if heuristic is not None else distance_map(goal))
+    if h(start) == math.inf:
+        return None, None, 0
+
+    # a node is (pos, time, conflicts, parent node)
+    # open: (f, tie breaker, node), focal: (conflicts, f, tie breaker, node)
+    counter = 0
+    root = (start, 0, 0, None)
+    open_list = [(h(start), counter, root)]
+    focal_list = [(0, h(start), counter, root)]
+    focal_bound = w * h(start)
+    closed = set()  # (pos, time)
+
+    while open_list:
+        while open_list and open_list[0][2][:2] in closed:
+            heapq.heappop(open_list)
+        if not open_list:
+            break
+
+        # when the lowest f grows, the nodes within the new bound join the focal list
+        f_min = open_list[0][0]
+        if w * f_min > focal_bound:
+            for f, c, node in open_list:
+                if focal_bound < f <= w * f_min:
+                    heapq.heappush(focal_list, (node[2], f, c, node))
+            focal_bound = w * f_min
+
+        _, _, _, node = heapq.heappop(focal_list)
+        current, time, conflicts, _ = node
+
+        if (current, time) in closed:
+            continue
+        closed.add((current, time))
+
+        if current == goal and time > goal_free_after:
+            path = []
+            while node is not None:
+                path.append(node[0])
+                node = node[3]
+            return path[::-1], f_min, len(closed)
+
+        new_time = time + 1
+        if new_time > max_time:
+            continue
+
+        for dx, dy in MOVES:
+            nx, ny = current[0] + dx, current[1] + dy
+            next_pos = (nx, ny)
+            if not (-grid_scale_factor <= nx <= grid_scale_factor and -grid_scale_factor <= ny <= grid_scale_factor):
+                continue
+            if (next_pos, new_time) in closed:
+                continue
+
+            # Constraint checks
+            if (next_pos, new_time) in vertex_constraints:
+                continue
+            if (current, next_pos, new_time) in edge_constraints:
+                continue
+            if next_pos in goal_constraints and new_time >= goal_constraints[next_pos]:
+                continue
+
+            next_h = h(next_pos)
+            if next_h == math.inf:
+                continue
+
+            counter += 1
+            next_f = new_time + next_h
+            next_conflicts = conflicts + count_conflicts(reservations, current, next_pos, new_time)
+            next_node = (next_pos, new_time, next_conflicts, node)
+            heapq.heappush(open_list, (next_f, counter, next_node))
+            if next_f <= focal_bound:
+                heapq.heappush(focal_list, (next_conflicts, next_f, counter, next_node))
+
+    return None, None, len(closed)
+
+
+def ecbs(agents, starts, goals, w=1.5, blocked=None, stats=None):
+    """
+    Enhanced CBS, a bounded suboptimal version of cbs.
+
+    agents: list of agent indices
+    starts: dict mapping agents to their starting positions
+    goals: dict mapping agents to their goal positions
+    w: suboptimality factor >= 1, the cost of the solution is at most w times the optimal cost
+    blocked: optional boolean array of the grid cells that cannot be entered, see occupancy.occupancy_grid
+    stats: optional PlannerStats filled in with the counters and timings of the search
+
+    Both the high level and the low level searches expand first, among the nodes
+    within w times the lowest cost bound, the ones with the fewest conflicts.
+
+    returns a dict mapping agents to their paths or None if no solution found
+    """
+    assert w >= 1, "The suboptimality factor must be at least 1"
+
+    start_time = time.perf_counter()
+    if stats is None:
+        stats = PlannerStats()
+    solution = _ecbs(agents, starts, goals, w, blocked, stats)
+    stats.finish(start_time)
+    return solution
+
+
+def _ecbs(agents, starts, goals, w, blocked, stats):
+    heuristics = compute_heuristics(agents, goals, blocked)
+    root_tables = {agent: build_constraint_table(agent, []) for agent in agents}
+    root_solution = {}
+    root_bounds = {}
+    for agent in agents:
+        path, lower_bound = focal_astar(
+            starts[agent], goals[agent], root_tables[agent], w, build_reservations(root_solution),
+            heuristics[agent], stats,
+        )
+        if path is None:
+            # No feasible individual paths – exit early
+            return None
+        root_solution[agent] = path
+        root_bounds[agent] = lower_bound
+    with stats.timing('conflict_time'):
+        root = ECBSNode([], root_solution, compute_cost(root_solution), root_tables, root_bounds)
+    stats.nodes_generated += 1
+
+    # open: (lower bound, tie breaker, node), focal: (conflicts, cost, tie breaker, node)
+    counter = 0
+    open_list = [(root.lower_bound, counter, root)]
+    focal_list = [(len(root.conflicts), root.cost, counter, root)]
+    focal_bound = w * root.lower_bound
+    expanded = set()  # tie breakers of the expanded nodes
+    stats.update_open_list(len(open_list))
+
+    while open_list:
+        while open_list and open_list[0][1] in expanded:
+            heapq.heappop(open_list)
+        if not open_list:
+            break
+
+        # when the lowest bound grows, the nodes within the new bound join the focal list
+        lower_bound = open_list[0][0]
+        if w * lower_bound > focal_bound:
+            for _, c, node in open_list:
+                if focal_bound < node.cost <= w * lower_bound:
+                    heapq.heappush(focal_list, (len(node.conflicts), node.cost, c, node))
+            focal_bound = w * lower_bound
+
+        _, _, c, node = heapq.heappop(focal_list)
+        expanded.add(c)
+        if not node.conflicts:
+            return node.solution
+        stats.nodes_expanded += 1
+
+        # create branches for each agent involved in the earliest conflict
+        for constraint in conflict_constraints(node.conflicts[0]):
+            agent = constraint['agent']
+            new_tables = constrain_tables(node.constraint_tables, constraint)
+            others = {a: p for a, p in node.solution.items() if a != agent}
+            path, lower_bound = focal_astar(
+                starts[agent], goals[agent], new_tables[agent], w, build_reservations(others),
+                heuristics[agent], stats,
+            )
+            if path:
+                new_solution = dict(node.solution)
+                new_solution[agent] = path
+                new_bounds = dict(node.lower_bounds)
+                new_bounds[agent] = lower_bound
+                with stats.timing('conflict_time'):
+                    new_node = ECBSNode(
+                        node.constraints + [constraint],
+                        new_solution,
+                        compute_cost(new_solution),
+                        new_tables,
+                        new_bounds,
+                    )
+                stats.nodes_generated += 1
+                counter += 1
+                heapq.heappush(open_list, (new_node.lower_bound, counter, new_node))
+                if new_node.cost <= focal_bound:
+                    heapq.heappush(focal_list, (len(new_node.conflicts), new_node.cost, counter, new_node))
+        stats.update_open_list(len(open_list))
     return None
 
 # Example usage
@@ -0,0 +1,33 @@
+import torch
+
+
+class CollisionCounter:
+    """
+    Counts the collisions between agents in each env of a batched environment,
+    with one batched distance computation per step
+    """
+
+    def __init__(self, env):
+        self.world = env.scenario.world
+        self.agents = env.agents
+        batch_dim = self.world.batch_dim
+        self.steps = torch.zeros(batch_dim, dtype=torch.long, device=self.world.device)   # steps with a collision, per env
+        self.events = torch.zeros(batch_dim, dtype=torch.long, device=self.world.device)  # new contacts between agents, per env
+        self.any_steps = torch.zeros((), dtype=torch.long, device=self.world.device)      # steps with a collision in any env
+        self.contacts = None  # (num_envs, n_agents, n_agents) contacts of the last step
+
+    def update(self):
+        """
+        counts the collisions of the current step
+
+        returns a (num_envs,) boolean tensor, True for the envs with a collision
+        """
+        contacts = self.world.get_collision_mask(self.agents).triu(diagonal=1)
+        colliding = contacts.any(dim=-1).any(dim=-1)
+        self.steps += colliding
+        self.any_steps += colliding.any()
+        # a contact is a new collision on the step it starts
+        new_contacts = contacts if self.contacts is None else contacts & ~self.contacts
+        self.events += new_contacts.sum(dim=(-1, -2))
+        self.contacts = contacts
+        return colliding
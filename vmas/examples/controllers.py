@@ -0,0 +1,208 @@
+import math
+import torch
+from vmas.simulator.utils import DRAG
+from helpers import (
+    kp,
+    avoid_radius,
+    repulse_strength,
+    max_force,
+    preferred_speed,
+    avoid_horizon,
+    avoid_weight,
+)
+
+
+def stack_positions(agents):
+    """
+    agents: list of VMAS agents
+
+    returns a (num_envs, n_agents, 2) tensor with the positions of the agents
+    """
+    return torch.stack([agent.state.pos for agent in agents], dim=1)
+
+
+def stack_velocities(agents):
+    """
+    agents: list of VMAS agents
+
+    returns a (num_envs, n_agents, 2) tensor with the velocities of the agents
+    """
+    return torch.stack([agent.state.vel for agent in agents], dim=1)
+
+
+def repulsive_forces(positions):
+    """
+    positions: (num_envs, n_agents, 2) tensor of agent positions
+
+    returns a (num_envs, n_agents, 2) tensor with, for each agent, the sum of the inverse
+    distance repulsions from the other agents of its env closer than avoid_radius
+    """
+    # vectors[b, i, j] points from agent j to agent i
+    vectors = positions.unsqueeze(2) - positions.unsqueeze(1)
+    distances = torch.linalg.vector_norm(vectors, dim=-1)
+    # agents do not repulse themselves
+    close = (distances < avoid_radius) & (distances > 1e-6)
+    scale = torch.where(close, repulse_strength / distances.clamp(min=1e-6) ** 2, 0.0)
+    return (vectors * scale.unsqueeze(-1)).sum(dim=2)
+
+
+def cap_forces(forces, limit=max_force):
+    """
+    returns forces, a (..., 2) tensor, with the vectors longer than limit scaled down to limit
+    """
+    norms = torch.linalg.vector_norm(forces, dim=-1, keepdim=True)
+    return torch.where(norms > limit, forces / norms.clamp(min=1e-12) * limit, forces)
+
+
+def waypoint_forces(positions, targets, final):
+    """
+    positions: (num_envs, n_agents, 2) tensor of agent positions
+    targets: (num_envs, n_agents, 2) tensor with the waypoint each agent is moving to
+    final: (num_envs, n_agents) boolean tensor, True for the agents moving to their last waypoint
+
+    Agents move to their last waypoint with proportional control and collision avoidance,
+    and to the other waypoints with a unit force towards them.
+
+    returns the (num_envs, n_agents, 2) capped forces of the agents
+    """
+    error = targets - positions
+    tracking = kp * error + repulsive_forces(positions)
+    norms = torch.linalg.vector_norm(error, dim=-1, keepdim=True)
+    constant = torch.where(norms != 0, error / norms.clamp(min=1e-12), 0.0)
+    forces = torch.where(final.unsqueeze(-1), tracking, constant)
+    return cap_forces(forces)
+
+
+def preferred_velocities(positions, targets, final, speed=preferred_speed):
+    """
+    positions: (num_envs, n_agents, 2) tensor of agent positions
+    targets: (num_envs, n_agents, 2) tensor with the waypoint each agent is moving to
+    final: (num_envs, n_agents) boolean tensor, True for the agents moving to their last waypoint
+
+    Agents move to their last waypoint with proportional control, and to the other
+    waypoints at the cruising speed, like waypoint_forces.
+
+    returns the (num_envs, n_agents, 2) velocities the agents would take without other agents
+    """
+    error = targets - positions
+    norms = torch.linalg.vector_norm(error, dim=-1, keepdim=True)
+    heading = torch.where(norms != 0, error / norms.clamp(min=1e-12), 0.0) * speed
+    return torch.where(final.unsqueeze(-1), cap_forces(kp * error, speed), heading)
+
+
+def time_to_collision(relative_positions, relative_velocities, distance):
+    """
+    relative_positions: (..., 2) tensor with the position of the other agent relative to the agent
+    relative_velocities: (..., 2) tensor with the velocity of the agent relative to the other agent
+    distance: distance between the centres of the agents when they touch
+
+    returns the (...) time until the agents touch, moving at constant velocity, inf if they
+    never do, 0 if they already touch and get closer
+    """
+    a = (relative_velocities**2).sum(dim=-1)
+    b = (relative_positions * relative_velocities).sum(dim=-1)
+    c = (relative_positions**2).sum(dim=-1) - distance**2
+    discriminant = b**2 - a * c
+    t = (b - discriminant.clamp(min=0).sqrt()) / a.clamp(min=1e-12)
+    colliding = (discriminant > 0) & (t >= 0) & (a > 1e-12)
+    return torch.where(
+        c <= 0,
+        torch.where(b > 0, 0.0, math.inf),
+        torch.where(colliding, t, math.inf),
+    )
+
+
+def avoidance_velocities(
+    positions,
+    velocities,
+    preferred,
+    radius,
+    speed=preferred_speed,
+    horizon=avoid_horizon,
+    weight=avoid_weight,
+    max_neighbours=6,
+    n_speeds=3,
+    n_angles=16,
+):
+    """
+    positions: (num_envs, n_agents, 2) tensor of agent positions
+    velocities: (num_envs, n_agents, 2) tensor of agent velocities
+    preferred: (num_envs, n_agents, 2) tensor of preferred velocities, see preferred_velocities
+    radius: radius of the agents
+    speed: largest speed of the candidate velocities
+    horizon: seconds ahead that collisions are avoided
+    weight: weight of the time to collision against the distance to the preferred velocity
+    max_neighbours: largest number of agents avoided by each agent, the nearest ones
+
+    Reciprocal velocity obstacles: each agent picks, among its preferred velocity, rest and
+    velocities on a polar grid, the one minimising its distance to the preferred velocity plus
+    weight over the time to collision with the other agents of its env closer than avoid_radius,
+    assuming that they take half of the avoidance.
+
+    returns the (num_envs, n_agents, 2) velocities picked by the agents
+    """
+    device = positions.device
+    n_agents = positions.shape[1]
+    speeds = torch.linspace(0, speed, n_speeds + 1, device=device)[1:]
+    angles = torch.arange(n_angles, device=device) * (2 * math.pi / n_angles)
+    grid = speeds.view(-1, 1, 1) * torch.stack([angles.cos(), angles.sin()], dim=-1)
+    grid = torch.cat([torch.zeros(1, 2, device=device), grid.view(-1, 2)])
+    # candidates[b, i, k] is the candidate velocity k of agent i: (num_envs, n_agents, C, 2)
+    candidates = torch.cat(
+        [preferred.unsqueeze(2), grid.expand(*positions.shape[:2], -1, -1)], dim=2
+    )
+
+    # relative_positions[b, i, j] points from agent i to agent j
+    relative_positions = positions.unsqueeze(1) - positions.unsqueeze(2)
+    distances = torch.linalg.vector_norm(relative_positions, dim=-1)
+    distances = torch.where(distances > 1e-6, distances, math.inf)
+    # the nearest agents of each agent, of which only those closer than avoid_radius are avoided
+    distances, nearest = distances.topk(min(max_neighbours, n_agents - 1), dim=-1, largest=False)
+    neighbours = distances < avoid_radius
+    relative_positions = relative_positions.gather(2, nearest.unsqueeze(-1).expand(-1, -1, -1, 2))
+    neighbour_velocities = velocities.unsqueeze(1).expand(-1, n_agents, -1, -1)
+    neighbour_velocities = neighbour_velocities.gather(2, nearest.unsqueeze(-1).expand(-1, -1, -1, 2))
+    # velocity of each agent relative to each neighbour, for each of its candidates:
+    # (num_envs, n_agents, C, max_neighbours, 2)
+    relative_velocities = (2 * candidates - velocities.unsqueeze(2)).unsqueeze(3) - neighbour_velocities.unsqueeze(2)
+    times = time_to_collision(relative_positions.unsqueeze(2), relative_velocities, 2 * radius)
+    times = torch.where(neighbours.unsqueeze(2), times, math.inf).amin(dim=-1)
+
+    penalty = torch.where(times < horizon, weight / times.clamp(min=1e-6), 0.0)
+    cost = torch.linalg.vector_norm(candidates - preferred.unsqueeze(2), dim=-1) + penalty
+    best = cost.argmin(dim=-1)
+    return candidates.gather(2, best[..., None, None].expand(-1, -1, 1, 2)).squeeze(2)
+
+
+def velocity_obstacle_forces(positions, velocities, targets, final, radius, dt, drag=DRAG):
+    """
+    positions: (num_envs, n_agents, 2) tensor of agent positions
+    velocities: (num_envs, n_agents, 2) tensor of agent velocities
+    targets: (num_envs, n_agents, 2) tensor with the waypoint each agent is moving to
+    final: (num_envs, n_agents) boolean tensor, True for the agents moving to their last waypoint
+    radius: radius of the agents
+    dt: duration of a simulation step
+    drag: drag of the agents, applied once per step
+
+    Tracks the waypoints like waypoint_forces, with reciprocal velocity obstacles for
+    collision avoidance instead of the repulsion between agents.
+
+    returns the (num_envs, n_agents, 2) forces that give unit mass agents the velocities
+    picked by avoidance_velocities after one step
+    """
+    preferred = preferred_velocities(positions, targets, final)
+    picked = avoidance_velocities(positions, velocities, preferred, radius)
+    return (picked - (1 - drag) * velocities) / dt
+
+
+def clamp_actions(agents, forces):
+    """
+    agents: list of VMAS agents
+    forces: (num_envs, n_agents, 2) tensor of forces
+
+    returns forces clamped to the u_range of each agent
+    """
+    u_range = torch.stack(
+        [agent.action.u_range_tensor.expand(forces.shape[-1]) for agent in agents]
+    )
+    return torch.clamp(forces, -u_range, u_range)
@@ -2,19 +2,22 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
-# read from results.csv
-data = pd.read_csv("results.csv", header=None, names=["algorithm", "seed", "num_agents", "num_collisions", "time"])
+from results import load_results
 
-# collision and time points
-c_pts = []
-t_pts = []
+# read the results written by runtest
+data = pd.DataFrame(load_results("results"))
 
-# create x, y coordinates for data in diff colliisions and diff time
-for i, (a, b) in enumerate(zip(data["num_collisions"][::2], data["num_collisions"][1::2])):
-    c_pts.append((int(data.iloc[i*2]["num_agents"]), (b - a)))
+# each seed run with and without planning, side by side
+paired = pd.merge(
+    data[data["method"] == "planning"],
+    data[data["method"] == "no_planning"],
+    on=["seed", "n_agents"],
+    suffixes=("_planning", "_no_planning"),
+)
 
-for i, (a, b) in enumerate(zip(data["time"][::2], data["time"][1::2])):
-    t_pts.append((int(data.iloc[i*2]["num_agents"]), (b - a)))
+# collision and time points
+c_pts = list(zip(paired["n_agents"], paired["collisions_no_planning"] - paired["collisions_planning"]))
+t_pts = list(zip(paired["n_agents"], paired["sim_time_no_planning"] - paired["sim_time_planning"]))
 
 
 # IQR-based outlier filtering using pandas
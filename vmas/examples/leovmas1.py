@@ -9,7 +9,7 @@ import torch
 
 from vmas import make_env
 from vmas.simulator.core import Agent
-from vmas.simulator.utils import save_video
+from vmas.simulator.utils import VideoWriter
 
 
 def _get_deterministic_action(agent: Agent, continuous: bool, env):
@@ -70,7 +70,12 @@ def use_vmas_env(
         **kwargs,
     )
 
-    frame_list = []  # For creating a gif
+    # Frames are encoded while the simulation runs
+    video = (
+        VideoWriter(scenario_name, fps=1 / env.scenario.world.dt)
+        if render and save_render
+        else None
+    )
     init_time = time.time()
     step = 0
 
@@ -120,13 +125,12 @@ def use_vmas_env(
         obs, rews, dones, info = env.step(actions)
 
         if render:
-            frame = env.render(
+            env.render(
                 mode="rgb_array",
                 agent_index_focus=None,  # Can give the camera an agent index to focus on
                 visualize_when_rgb=visualize_render,
+                sink=video,
             )
-            if save_render:
-                frame_list.append(frame)
 
     total_time = time.time() - init_time
     print(
@@ -134,8 +138,8 @@ def use_vmas_env(
         f"for {scenario_name} scenario."
     )
 
-    if render and save_render:
-        save_video(scenario_name, frame_list, fps=1 / env.scenario.world.dt)
+    if video is not None:
+        video.close()
 
 
 if __name__ == "__main__":
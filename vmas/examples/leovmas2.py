@@ -7,17 +7,19 @@ import math
 import torch
 from vmas import make_env
 from vmas.simulator.core import Agent
-from vmas.simulator.utils import save_video
+from vmas.simulator.utils import VideoWriter
+from collisions import CollisionCounter
+from controllers import (
+    stack_positions,
+    stack_velocities,
+    waypoint_forces,
+    velocity_obstacle_forces,
+    clamp_actions,
+)
 from helpers import (
     num_agents,
     grid_scale_factor,
-    kp,
-    following_distance,
-    avoid_radius,
-    repulse_strength,
     num_steps,
-    max_force,
-    detect_collision
 )
 
 
@@ -32,6 +34,8 @@ def run_no_planning(
     continuous_actions: bool = True,
     visualize_render: bool = True,
     dict_spaces: bool = True,
+    timings: dict = None,
+    controller: str = "repulsive",
     **kwargs,
 ):
     """Example function to use a vmas environment
@@ -48,12 +52,21 @@ def run_no_planning(
         visualize_render (bool, optional): Whether to visualize the render. Defaults to ``True``.
         dict_spaces (bool, optional): Weather to return obs, rewards, and infos as dictionaries with agent names.
             By default, they are lists of len # of agents
+        timings (dict, optional): Filled with the wall-clock seconds spent planning, always 0
+            without planning, as ``"planning"`` and simulating as ``"simulation"``.
+        controller (str, optional): Collision avoidance of the agents, ``"repulsive"`` (repulsion
+            between close agents) or ``"velocity_obstacle"`` (reciprocal velocity obstacles).
+            Defaults to ``"repulsive"``.
         kwargs (dict, optional): Keyword arguments to pass to the scenario
 
     Returns:
 
     """
     assert not (save_render and not render), "To save the video you have to render it"
+    if controller not in ("repulsive", "velocity_obstacle"):
+        raise ValueError(
+            f"Unknown controller {controller}, expected repulsive or velocity_obstacle"
+        )
 
     env = make_env(
         scenario=scenario_name,
@@ -69,9 +82,14 @@ def run_no_planning(
     for agent in env.agents:
         agent.render_action = True
 
-    frame_list = []  # For creating a gif
+    # Frames are encoded while the simulation runs
+    video = (
+        VideoWriter(scenario_name, fps=1 / env.scenario.world.dt)
+        if render and save_render
+        else None
+    )
     init_time = time.time()
-    collision_count = 0
+    collisions = CollisionCounter(env)
     step = 0
 
     for _ in range(n_steps):
@@ -84,37 +102,29 @@ def run_no_planning(
         dict_actions = random.choice([True, False])
 
         actions = {} if dict_actions else []
-        for agent in env.agents:
+
+        if not random_action:
+            # P controller with collision avoidance, for all the agents at once.
+            # Without a plan, the goal of each agent is its last waypoint
+            positions = stack_positions(env.agents)
+            goals = torch.stack([agent.goal.state.pos for agent in env.agents], dim=1)
+            final = torch.ones(positions.shape[:2], dtype=torch.bool, device=positions.device)
+            if controller == "velocity_obstacle":
+                forces = velocity_obstacle_forces(
+                    positions,
+                    stack_velocities(env.agents),
+                    goals,
+                    final,
+                    env.agents[0].shape.radius,
+                    env.scenario.world.dt,
+                )
+            else:
+                forces = waypoint_forces(positions, goals, final)
+            forces = clamp_actions(env.agents, forces)
+
+        for i, agent in enumerate(env.agents):
             if not random_action:
-                # Simple P controller with collision avoidance
-                goal_pos = agent.goal.state.pos
-                agent_pos = agent.state.pos
-                error = goal_pos - agent_pos
-                kp = 0.8
-                attractive_force = kp * error
-
-                # Collision avoidance
-                repulsive_force = torch.zeros_like(attractive_force)
-
-                for other in env.agents:
-                    if other is agent:
-                        continue
-                    other_pos = other.state.pos
-                    vec = agent_pos - other_pos
-                    dist = torch.norm(vec)
-                    if dist < avoid_radius and dist > 1e-6:
-                        repulsive_force += repulse_strength * vec / dist**2
-
-                # Combine and cap force
-                force = attractive_force + repulsive_force
-                force_norm = torch.norm(force)
-                if force_norm > max_force:
-                    force = force / force_norm * max_force
-
-                u_range = agent.action.u_range_tensor
-                if u_range.dim() == 1:
-                    u_range = u_range.view(1, -1)
-                action = torch.clamp(force, -u_range, u_range)
+                action = forces[:, i]
             else:
                 action = env.get_random_action(agent)
             if dict_actions:
@@ -129,26 +139,29 @@ def run_no_planning(
             break
 
         # Check for collisions
-        if detect_collision(env):
-            collision_count += 1
-            print("Collision detected!")
+        collisions.update()
 
         if render:
-            frame = env.render(
+            env.render(
                 mode="rgb_array",
                 agent_index_focus=None,  # Can give the camera an agent index to focus on
                 visualize_when_rgb=visualize_render,
+                sink=video,
             )
-            if save_render:
-                frame_list.append(frame)
 
     wall_time = time.time() - init_time
+    if timings is not None:
+        timings["planning"] = 0.0
+        timings["simulation"] = wall_time
     sim_time = step * env.scenario.world.dt
 
-
-    if render and save_render:
-        save_video(scenario_name, frame_list, fps=1 / env.scenario.world.dt)
-    print(f'{collision_count} collisions, {sim_time:.2f}s')
+    if video is not None:
+        video.close()
+    # steps with a collision in any env, and new contacts per env
+    collision_count = collisions.any_steps.item()
+    print(
+        f"{collision_count} collisions, {collisions.events.tolist()} new contacts, {sim_time:.2f}s"
+    )
 
     return collision_count, sim_time
 
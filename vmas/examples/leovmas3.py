@@ -9,8 +9,9 @@ import torch
 
 from vmas import make_env
 from vmas.simulator.core import Agent
-from vmas.simulator.utils import save_video
+from vmas.simulator.utils import VideoWriter
 from cbs import cbs
+from collisions import CollisionCounter
 from helpers import (
     num_agents,
     grid_scale_factor,
@@ -20,7 +21,6 @@ from helpers import (
     repulse_strength,
     num_steps,
     max_force,
-    detect_collision,
 )
 
 
@@ -72,9 +72,14 @@ def use_vmas_env(
     for agent in env.agents:
         agent.render_action = True
 
-    frame_list = []  # For creating a gif
+    # Frames are encoded while the simulation runs
+    video = (
+        VideoWriter(scenario_name, fps=1 / env.scenario.world.dt)
+        if render and save_render
+        else None
+    )
     init_time = time.time()
-    collision_count = 0
+    collisions = CollisionCounter(env)
     step = 0
 
     agents = []
@@ -153,25 +158,23 @@ def use_vmas_env(
             break
 
         # Check for collisions
-        if detect_collision(env):
-            collision_count += 1
-            print("Collision detected!")
+        collisions.update()
 
         if render:
-            frame = env.render(
+            env.render(
                 mode="rgb_array",
                 agent_index_focus=None,  # Can give the camera an agent index to focus on
                 visualize_when_rgb=visualize_render,
+                sink=video,
             )
-            if save_render:
-                frame_list.append(frame)
 
     total_time = time.time() - init_time
+    collision_count = collisions.any_steps.item()
     print(f"{num_agents} robots, {collision_count} collisions, {total_time:.2f}s")
 
 
-    if render and save_render:
-        save_video(scenario_name, frame_list, fps=1 / env.scenario.world.dt)
+    if video is not None:
+        video.close()
 
 
 if __name__ == "__main__":
@@ -5,24 +5,27 @@ import random
 import time
 import math
 import torch
-import numpy as np
 import csv
 from vmas import make_env
 from vmas.simulator.core import Agent
-from vmas.simulator.utils import save_video
-from cbs import cbs
-from scipy.interpolate import splprep, splev
+from vmas.simulator.utils import VideoWriter
+from cbs import cbs, ecbs
+from pbs import pbs, prioritized_planning
+from occupancy import occupancy_grid
+from controllers import (
+    stack_positions,
+    stack_velocities,
+    waypoint_forces,
+    velocity_obstacle_forces,
+    clamp_actions,
+)
+from waypoints import WaypointTracks
+from batched_planning import planning_problems, plan_envs, pack_plans
+from collisions import CollisionCounter
+from replanning import Replanner, snap_to_grid
 from helpers import (
     num_agents,
-    grid_scale_factor,
-    kp,
-    following_distance,
-    avoid_radius,
-    repulse_strength,
     num_steps,
-    max_force,
-    spline_error,
-    detect_collision,
 )
 
 
@@ -37,6 +40,15 @@ def run_planning(
     continuous_actions: bool = True,
     visualize_render: bool = True,
     dict_spaces: bool = True,
+    planner: str = "cbs",
+    suboptimality: float = 1.5,
+    time_budget: float = 1.0,
+    plan_cache=None,
+    timings: dict = None,
+    replan: bool = False,
+    controller: str = "repulsive",
+    planning_workers: int = None,
+    episodes: dict = None,
     **kwargs,
 ):
     """Example function to use a vmas environment
@@ -53,12 +65,39 @@ def run_planning(
         visualize_render (bool, optional): Whether to visualize the render. Defaults to ``True``.
         dict_spaces (bool, optional): Weather to return obs, rewards, and infos as dictionaries with agent names.
             By default, they are lists of len # of agents
+        planner (str, optional): Multi-agent path finding algorithm, one of ``"cbs"`` (optimal),
+            ``"ecbs"`` (bounded suboptimal, much faster on crowded grids), ``"prioritized"``
+            (prioritized planning) or ``"pbs"`` (priority-based search). The last two always
+            return within ``time_budget``. Defaults to ``"cbs"``.
+        suboptimality (float, optional): For ``"ecbs"``, bound on the ratio between the cost
+            of the plan and the optimal cost. Defaults to ``1.5``.
+        time_budget (float, optional): For ``"prioritized"`` and ``"pbs"``, wall-clock seconds
+            after which the best plan found is used. Defaults to ``1.0``.
+        plan_cache (PlanCache, optional): Cache to reuse the plans of identical problems,
+            from :mod:`plan_cache`. Defaults to no caching.
+        timings (dict, optional): Filled with the wall-clock seconds spent planning, smoothing
+            included, as ``"planning"`` and simulating as ``"simulation"``.
+        replan (bool, optional): Whether to replan the agents of an env from their grid cells,
+            in the background, when one of them strays from its track or two of them are about
+            to collide, see :mod:`replanning`. Defaults to ``False``.
+        controller (str, optional): Collision avoidance of the waypoint follower, ``"repulsive"``
+            (repulsion between close agents) or ``"velocity_obstacle"`` (reciprocal velocity
+            obstacles). Defaults to ``"repulsive"``.
+        planning_workers (int, optional): Number of processes planning the envs at once, each
+            env is planned from its own starts and goals. Defaults to the number of cores.
+        episodes (dict, optional): Filled with the results of each env, the steps with a collision
+            as ``"collisions"`` and the time its agents reached their goals, or the time of the
+            run if they did not, as ``"time_to_goal"``.
         kwargs (dict, optional): Keyword arguments to pass to the scenario
 
     Returns:
 
     """
     assert not (save_render and not render), "To save the video you have to render it"
+    if controller not in ("repulsive", "velocity_obstacle"):
+        raise ValueError(
+            f"Unknown controller {controller}, expected repulsive or velocity_obstacle"
+        )
 
     env = make_env(
         scenario=scenario_name,
@@ -74,33 +113,66 @@ def run_planning(
     for agent in env.agents:
         agent.render_action = True
 
-    frame_list = []  # For creating a gif
+    # Frames are encoded while the simulation runs
+    video = (
+        VideoWriter(scenario_name, fps=3 / env.scenario.world.dt)
+        if render and save_render
+        else None
+    )
     init_time = time.time()
-    collision_count = 0
+    collisions = CollisionCounter(env)
     step = 0
+    # step at which all the agents of each env reached their goals
+    goal_steps = torch.full((num_envs,), n_steps, device=env.device)
 
-    agents = []
-    starts = {}
-    goals = {}
-
-    # populates inputs to cbs
-    for i, agent in enumerate(env.agents):
-        agents.append(i)
-        starts[i] = tuple((agent.state.pos[0] * grid_scale_factor).tolist())
-        goals[i] = tuple((agent.goal.state.pos[0] * grid_scale_factor).tolist())
+    planning_start = time.time()
+    # starts and goals of the agents of each env, in grid cells
+    agents, starts, goals = planning_problems(env)
 
-    plan = cbs(agents, starts, goals)
+    planners = {
+        "cbs": (cbs, {}),
+        "ecbs": (ecbs, {"w": suboptimality}),
+        "prioritized": (prioritized_planning, {"time_budget": time_budget}),
+        "pbs": (pbs, {"time_budget": time_budget}),
+    }
+    if planner not in planners:
+        raise ValueError(
+            f"Unknown planner {planner}, expected one of {', '.join(planners)}"
+        )
+    plan_function, params = planners[planner]
+    # cells blocked by the obstacles of each env
+    planner_params = [
+        dict(params, blocked=occupancy_grid(env.world, env_index))
+        for env_index in range(num_envs)
+    ]
+    plans = plan_envs(
+        plan_function,
+        agents,
+        starts,
+        goals,
+        planner_params,
+        plan_cache=plan_cache,
+        n_workers=planning_workers,
+    )
 
-    spline_plan = {}
+    # the paths of all the envs are smoothed at once into evenly spaced waypoints
+    tracks = WaypointTracks(
+        pack_plans(plans, agents, starts, goals, n_waypoints=50, device=env.device)
+    )
+    simulation_start = time.time()
+    if timings is not None:
+        timings["planning"] = simulation_start - planning_start
 
-    for k, v in plan.items():
-        # k is agent index, v is a list of positions
-        x, y = zip(*v)
-        k_val = min(3, len(v) - 1)
-        tck, u = splprep([x, y], s=spline_error, k=k_val)
-        u_fine = np.linspace(0, 1, 50)
-        x_smooth, y_smooth = splev(u_fine, tck)
-        spline_plan[k] = list(zip(x_smooth, y_smooth))
+    replanner = (
+        Replanner(
+            plan_function,
+            planner_params,
+            snap_to_grid(torch.stack([agent.goal.state.pos for agent in env.agents], dim=1)),
+            conflict_distance=2 * env.agents[0].shape.radius,
+        )
+        if replan
+        else None
+    )
 
     for _ in range(n_steps):
         step += 1
@@ -113,53 +185,30 @@ def run_planning(
 
         actions = {} if dict_actions else []
 
+        if not random_action:
+            # all the agents are controlled at once, from the positions at the start of the step
+            positions = stack_positions(env.agents)
+            if replanner is not None:
+                replanner.update(step, positions, stack_velocities(env.agents), tracks)
+            # an agent close to its waypoint moves on, but still heads to it in this step
+            targets = tracks.targets()
+            tracks.advance(positions)
+            if controller == "velocity_obstacle":
+                forces = velocity_obstacle_forces(
+                    positions,
+                    stack_velocities(env.agents),
+                    targets,
+                    tracks.final(),
+                    env.agents[0].shape.radius,
+                    env.scenario.world.dt,
+                )
+            else:
+                forces = waypoint_forces(positions, targets, tracks.final())
+            forces = clamp_actions(env.agents, forces)
+
         for i, agent in enumerate(env.agents):
             if not random_action:
-                # if agent is close to the next position in plan, update velocity vector to move there
-                agent_pos = agent.state.pos
-                next_pos = torch.tensor(
-                    [
-                        spline_plan[i][0][0] / grid_scale_factor,
-                        spline_plan[i][0][1] / grid_scale_factor,
-                    ],
-                    device=env.device,
-                )
-                error = next_pos - agent_pos
-                if error.norm() < following_distance and len(spline_plan[i]) > 1:
-                    spline_plan[i].pop(0)
-
-                attractive_force = kp * error
-
-                # Collision avoidance
-                repulsive_force = torch.zeros_like(attractive_force)
-
-                for other in env.agents:
-                    if other is agent:
-                        continue
-                    other_pos = other.state.pos
-                    vec = agent_pos - other_pos
-                    dist = torch.norm(vec)
-                    if dist < avoid_radius and dist > 1e-6:
-                        repulsive_force += repulse_strength * vec / dist**2
-
-                # Combine and cap force
-                if len(spline_plan[i]) == 1:
-                    # Use proportional control for the final point
-                    force = attractive_force + repulsive_force
-                else:
-                    # Use constant force in direction of error
-                    if error.norm() != 0:
-                        force = error / error.norm() * 1
-                    else:
-                        force = torch.zeros_like(error)
-                force_norm = torch.norm(force)
-                if force_norm > max_force:
-                    force = force / force_norm * max_force
-
-                u_range = agent.action.u_range_tensor
-                if u_range.dim() == 1:
-                    u_range = u_range.view(1, -1)
-                action = torch.clamp(force, -u_range, u_range)
+                action = forces[:, i]
             else:
                 action = env.get_random_action(agent)
             if dict_actions:
@@ -168,33 +217,42 @@ def run_planning(
                 actions.append(action)
 
         obs, rews, dones, info = env.step(actions)
+        goal_steps = torch.where(dones & (goal_steps > step), step, goal_steps)
 
         if dones.all():
             print("All agents reached their goals!")
             break
 
         # Check for collisions
-        if detect_collision(env):
-            collision_count += 1
-            print("Collision detected!")
+        collisions.update()
 
         if render:
-            frame = env.render(
+            env.render(
                 mode="rgb_array",
                 agent_index_focus=None,  # Can give the camera an agent index to focus on
                 visualize_when_rgb=visualize_render,
+                sink=video,
             )
-            if save_render:
-                frame_list.append(frame)
 
     wall_time = time.time() - init_time
+    if timings is not None:
+        timings["simulation"] = time.time() - simulation_start
+    if replanner is not None:
+        replanner.close()
+        print(f"{replanner.n_replans} replans")
     sim_time = step * env.scenario.world.dt
+    if episodes is not None:
+        episodes["collisions"] = collisions.steps
+        episodes["time_to_goal"] = goal_steps * env.scenario.world.dt
 
+    if video is not None:
+        video.close()
 
-    if render and save_render:
-        save_video(scenario_name, frame_list, fps=3 / env.scenario.world.dt)
-
-    print(f'{collision_count} collisions, {sim_time:.2f}s')
+    # steps with a collision in any env, and new contacts per env
+    collision_count = collisions.any_steps.item()
+    print(
+        f"{collision_count} collisions, {collisions.events.tolist()} new contacts, {sim_time:.2f}s"
+    )
     return collision_count, sim_time
 
 
@@ -0,0 +1,70 @@
+import torch
+from vmas.simulator.core import Box, Line, Sphere
+from helpers import grid_scale_factor
+
+
+def grid_positions(device="cpu"):
+    """
+    returns a (2 * grid_scale_factor + 1, 2 * grid_scale_factor + 1, 2) tensor with the
+    world position of each planning grid cell, indexed like cbs.cell_index
+    """
+    cells = torch.arange(-grid_scale_factor, grid_scale_factor + 1, device=device, dtype=torch.float32)
+    x, y = torch.meshgrid(cells, cells, indexing="ij")
+    return torch.stack([x, y], dim=-1) / grid_scale_factor
+
+
+def distance_to_entity(entity, points, env_index=0):
+    """
+    entity: VMAS entity with a Sphere, Box or Line shape
+    points: (..., 2) tensor of world positions
+
+    returns the distance of each point from the entity, 0 inside it
+    """
+    pos = entity.state.pos[env_index]
+    rot = entity.state.rot[env_index, 0]
+    shape = entity.shape
+    if isinstance(shape, Sphere):
+        return (torch.linalg.vector_norm(points - pos, dim=-1) - shape.radius).clamp(min=0)
+
+    # points in the frame of the entity, with x along its length
+    delta = points - pos
+    local = torch.stack(
+        [
+            delta[..., 0] * rot.cos() + delta[..., 1] * rot.sin(),
+            -delta[..., 0] * rot.sin() + delta[..., 1] * rot.cos(),
+        ],
+        dim=-1,
+    ).abs()
+    if isinstance(shape, Line):
+        half_size = torch.tensor([shape.length / 2, 0.0], device=points.device)
+    elif isinstance(shape, Box):
+        half_size = torch.tensor([shape.length / 2, shape.width / 2], device=points.device)
+    else:
+        raise ValueError(f"Occupancy not computable for shape {shape}")
+
+    outside = torch.linalg.vector_norm((local - half_size).clamp(min=0), dim=-1)
+    if isinstance(shape, Box) and shape.hollow:
+        # only the sides of a hollow box are solid
+        inside = (half_size - local).min(dim=-1)[0].clamp(min=0)
+        return outside + inside
+    return outside
+
+
+def occupancy_grid(world, env_index=0, margin=None):
+    """
+    world: VMAS World
+    env_index: index of the environment whose entities are used
+    margin: clearance kept from the entities, defaults to half the distance between cells
+
+    returns a (2 * grid_scale_factor + 1, 2 * grid_scale_factor + 1) boolean numpy array,
+    indexed like cbs.cell_index, that is True for the cells blocked by the collidable
+    entities of the world that are not agents
+    """
+    if margin is None:
+        margin = 0.5 / grid_scale_factor
+    points = grid_positions(world.device)
+    blocked = torch.zeros(points.shape[:-1], dtype=torch.bool, device=world.device)
+    for landmark in world.landmarks:
+        if landmark.collide:
+            blocked |= distance_to_entity(landmark, points, env_index) <= margin
+    return blocked.cpu().numpy()
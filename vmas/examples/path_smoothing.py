@@ -0,0 +1,136 @@
+import torch
+
+
+# coefficients of the uniform Catmull-Rom segment from p1 to p2 in the basis
+# (1, t, t^2, t^3), applied to its control points (p0, p1, p2, p3)
+CATMULL_ROM = 0.5 * torch.tensor(
+    [
+        [0.0, 2.0, 0.0, 0.0],
+        [-1.0, 0.0, 1.0, 0.0],
+        [2.0, -5.0, 4.0, -1.0],
+        [-1.0, 3.0, -3.0, 1.0],
+    ]
+)
+
+
+def pack_paths(paths, device="cpu"):
+    """
+    paths: list of paths, each a sequence of (x, y) positions
+
+    drops the repeated positions of waiting in place, which a spline cannot fit
+
+    returns a (n_paths, P, 2) tensor of the paths padded with their last position
+    and a (n_paths,) tensor with the number of positions of each path
+    """
+    paths = [[p for j, p in enumerate(path) if j == 0 or p != path[j - 1]] for path in paths]
+    n_points = max(len(path) for path in paths)
+    padded = [list(path) + [path[-1]] * (n_points - len(path)) for path in paths]
+    return (
+        torch.tensor(padded, device=device, dtype=torch.float32),
+        torch.tensor([len(path) for path in paths], device=device),
+    )
+
+
+def catmull_rom(points, lengths):
+    """
+    points: (n_paths, P, 2) tensor of padded paths, as returned by pack_paths
+    lengths: (n_paths,) tensor with the number of points of each path
+
+    Fits uniform Catmull-Rom splines through the points of each path. The ends are
+    extended by reflection, so the splines leave and reach them in a straight line.
+
+    returns the (n_paths, max(P - 1, 1), 4, 2) coefficients of the spline segments in the
+    basis (1, t, t^2, t^3), the segments of the padding stay at the last point
+    """
+    n_paths, n_points, _ = points.shape
+    device = points.device
+    last = (lengths.to(device) - 1).view(-1, 1, 1)
+    n_segments = max(n_points - 1, 1)
+
+    # index of the control points (p0, p1, p2, p3) of each segment: (n_paths, segments, 4)
+    index = (
+        torch.arange(n_segments, device=device).view(1, -1, 1)
+        + torch.arange(-1, 3, device=device).view(1, 1, -1)
+    ).expand(n_paths, -1, -1)
+
+    def point(i):
+        return points.gather(1, i.reshape(n_paths, -1, 1).expand(-1, -1, 2))
+
+    control = point(torch.minimum(index.clamp(min=0), last)).view(n_paths, n_segments, 4, 2)
+    last_point = point(last).unsqueeze(1)
+    before = 2 * point(torch.zeros_like(last)) - point(last.clamp(max=1))
+    after = 2 * point(last) - point((last - 1).clamp(min=0))
+    control = torch.where((index < 0).unsqueeze(-1), before.unsqueeze(1), control)
+    control = torch.where((index > last).unsqueeze(-1), after.unsqueeze(1), control)
+    coefficients = CATMULL_ROM.to(device) @ control
+
+    # past the end of a path the spline stays at its last point
+    padding = torch.arange(n_segments, device=device).view(1, -1, 1, 1) >= last.unsqueeze(-1)
+    constant = torch.cat([last_point, torch.zeros_like(last_point).expand(-1, -1, 3, -1)], dim=2)
+    return torch.where(padding, constant, coefficients)
+
+
+def evaluate(coefficients, segment, t, order=0):
+    """
+    coefficients: (n_paths, segments, 4, 2) coefficients, as returned by catmull_rom
+    segment: (n_paths, K) tensor with the segment of each point to evaluate
+    t: (n_paths, K) tensor with the parameter of each point in its segment, in [0, 1]
+    order: 0 for positions, 1 and 2 for first and second derivatives
+
+    returns the (n_paths, K, 2) values of the splines
+    """
+    ones, zeros = torch.ones_like(t), torch.zeros_like(t)
+    basis = [
+        [ones, t, t**2, t**3],
+        [zeros, ones, 2 * t, 3 * t**2],
+        [zeros, zeros, 2 * ones, 6 * t],
+    ][order]
+    selected = coefficients.gather(1, segment[..., None, None].expand(-1, -1, 4, 2))
+    return (torch.stack(basis, dim=-1).unsqueeze(-1) * selected).sum(dim=2)
+
+
+def smooth_paths(paths, n_waypoints=50, samples_per_segment=16, device="cpu"):
+    """
+    paths: list of paths, each a sequence of (x, y) positions
+    n_waypoints: number of waypoints of each smoothed path
+    samples_per_segment: samples of each spline segment used to measure its arc length
+
+    Fits all the paths with Catmull-Rom splines at once and resamples them at evenly spaced arc lengths.
+
+    returns (n_paths, n_waypoints, 2) tensors of the waypoints and of the unit tangents
+    of the splines, the velocity direction at unit speed, and the (n_paths, n_waypoints)
+    signed curvature of the splines, positive when turning left
+    """
+    points, lengths = pack_paths(paths, device)
+    coefficients = catmull_rom(points, lengths)
+    n_paths, n_segments = coefficients.shape[:2]
+
+    # arc length of the splines, measured along samples at evenly spaced parameters
+    t = torch.linspace(0, 1, samples_per_segment + 1, device=device)
+    powers = torch.stack([torch.ones_like(t), t, t**2, t**3], dim=-1)
+    samples = torch.einsum("sk,nqkd->nqsd", powers, coefficients)
+    samples = torch.cat([samples[:, :, :-1].flatten(1, 2), samples[:, -1:, -1]], dim=1)
+    steps = torch.linalg.vector_norm(samples[:, 1:] - samples[:, :-1], dim=-1)
+    arc_length = torch.cat([torch.zeros_like(steps[:, :1]), steps.cumsum(dim=1)], dim=1)
+
+    # parameters of evenly spaced arc lengths, interpolated between the samples
+    targets = torch.linspace(0, 1, n_waypoints, device=device) * arc_length[:, -1:]
+    upper = torch.searchsorted(arc_length, targets).clamp(1, arc_length.shape[1] - 1)
+    lower_length = arc_length.gather(1, upper - 1)
+    span = (arc_length.gather(1, upper) - lower_length).clamp(min=1e-9)
+    parameter = (upper - 1 + ((targets - lower_length) / span).clamp(0, 1)) / samples_per_segment
+    # the end of a segment is evaluated on it, not at the start of the next one
+    last_segment = (lengths.to(device) - 2).clamp(min=0).unsqueeze(1)
+    segment = torch.minimum(parameter.floor().long(), last_segment)
+    t = (parameter - segment).clamp(0, 1)
+
+    waypoints = evaluate(coefficients, segment, t)
+    velocities = evaluate(coefficients, segment, t, order=1)
+    accelerations = evaluate(coefficients, segment, t, order=2)
+
+    speed = torch.linalg.vector_norm(velocities, dim=-1)
+    moving = speed > 1e-6
+    tangents = velocities / speed.clamp(min=1e-6).unsqueeze(-1) * moving.unsqueeze(-1)
+    cross = velocities[..., 0] * accelerations[..., 1] - velocities[..., 1] * accelerations[..., 0]
+    curvature = cross / speed.clamp(min=1e-6) ** 3 * moving
+    return waypoints, tangents, curvature
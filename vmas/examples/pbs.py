@@ -0,0 +1,184 @@
+import random
+import time
+from cbs import (
+    astar,
+    build_constraint_table,
+    compute_cost,
+    compute_heuristics,
+    compute_solution,
+    detect_conflict,
+)
+
+
+def reserve_path(table, path):
+    """
+    table: constraint table of a lower priority agent, as built by build_constraint_table
+    path: path of a higher priority agent
+
+    adds to table the constraints that keep the agent out of the way of path
+    """
+    for t, pos in enumerate(path):
+        table['vertex'].add((pos, t))
+        if t > 0 and path[t - 1] != pos:
+            # the agent cannot swap places with the higher priority agent
+            table['edge'].add((pos, path[t - 1], t))
+    # the higher priority agent stays at its goal after its path ends
+    goal = path[-1]
+    table['goal'][goal] = min(table['goal'].get(goal, len(path) - 1), len(path) - 1)
+
+
+def plan_in_order(order, starts, goals, heuristics):
+    """
+    order: list of agent indices, from the highest to the lowest priority
+    starts: dict mapping agents to their starting positions
+    goals: dict mapping agents to their goal positions
+    heuristics: dict mapping agents to their distance maps, as built by compute_heuristics
+
+    plans the agents one at a time, each avoiding the paths of the agents before it
+
+    returns a dict mapping agents to their paths or None if an agent has no path
+    """
+    solution = {}
+    table = build_constraint_table(None, [])
+    for agent in order:
+        path = astar(starts[agent], goals[agent], table, heuristics[agent])
+        if path is None:
+            return None
+        solution[agent] = path
+        reserve_path(table, path)
+    return solution
+
+
+def prioritized_planning(agents, starts, goals, time_budget=1.0, seed=0, blocked=None):
+    """
+    Prioritized planning: agents are planned one at a time with space-time A*
+    against the paths of the agents planned before them.
+
+    agents: list of agent indices, in the order of the first priority ordering to try
+    starts: dict mapping agents to their starting positions
+    goals: dict mapping agents to their goal positions
+    time_budget: wall-clock seconds after which no new ordering is tried
+    seed: seed of the random orderings tried when an ordering fails
+    blocked: optional boolean array of the grid cells that cannot be entered, see occupancy.occupancy_grid
+
+    returns a dict mapping agents to their paths, from the first ordering that succeeds.
+    If none succeeds within the budget, the independent shortest paths are returned, which may have conflicts.
+    Returns None only if an agent cannot reach its goal at all
+    """
+    deadline = time.time() + time_budget
+    heuristics = compute_heuristics(agents, goals, blocked)
+    rng = random.Random(seed)
+    order = list(agents)
+    while True:
+        solution = plan_in_order(order, starts, goals, heuristics)
+        if solution is not None:
+            return solution
+        if time.time() > deadline:
+            break
+        rng.shuffle(order)
+
+    tables = {agent: build_constraint_table(agent, []) for agent in agents}
+    return compute_solution(agents, tables, starts, goals, heuristics)
+
+
+class PBSNode:
+    def __init__(self, priorities, solution):
+        self.priorities = priorities  # set: pairs (high, low) of agents, high has priority over low
+        self.solution = solution      # dict: maps agents to paths
+        self.cost = compute_cost(solution)
+        self.conflicts = detect_conflict(solution, all_conflicts=True)  # list: conflicts in the solution
+
+
+def higher_agents(priorities, agent):
+    """
+    returns the set of agents that have priority over agent, directly or transitively
+    """
+    higher = set()
+    stack = [agent]
+    while stack:
+        low = stack.pop()
+        for high, other in priorities:
+            if other == low and high not in higher:
+                higher.add(high)
+                stack.append(high)
+    return higher
+
+
+def replan_below(node, priorities, agent, starts, goals, heuristics):
+    """
+    replans agent and all the agents with lower priority than it, each avoiding the
+    paths of the agents with priority over it
+
+    returns the new solution or None if an agent has no path
+    """
+    lower = {a for a in node.solution if agent in higher_agents(priorities, a)}
+    to_replan = lower | {agent}
+    solution = dict(node.solution)
+
+    # replan in topological order, so that the higher agents are planned first
+    while to_replan:
+        ready = [
+            a for a in to_replan
+            if not higher_agents(priorities, a) & to_replan
+        ]
+        for a in sorted(ready):
+            table = build_constraint_table(a, [])
+            for high in higher_agents(priorities, a):
+                reserve_path(table, solution[high])
+            path = astar(starts[a], goals[a], table, heuristics[a])
+            if path is None:
+                return None
+            solution[a] = path
+            to_replan.discard(a)
+    return solution
+
+
+def pbs(agents, starts, goals, time_budget=1.0, blocked=None):
+    """
+    Priority-Based Search: a depth-first search over the priority orderings of the agents.
+    Each conflict is solved by giving one of the two agents priority over the other
+    and replanning the agents below it.
+
+    agents: list of agent indices
+    starts: dict mapping agents to their starting positions
+    goals: dict mapping agents to their goal positions
+    time_budget: wall-clock seconds after which the search stops
+    blocked: optional boolean array of the grid cells that cannot be entered, see occupancy.occupancy_grid
+
+    returns a dict mapping agents to their paths, or None if an agent cannot reach its goal at all.
+    If the budget runs out or the search fails, the solution with the fewest conflicts found is returned
+    """
+    deadline = time.time() + time_budget
+
+    heuristics = compute_heuristics(agents, goals, blocked)
+    tables = {agent: build_constraint_table(agent, []) for agent in agents}
+    root_solution = compute_solution(agents, tables, starts, goals, heuristics)
+    if root_solution is None:
+        # No feasible individual paths – exit early
+        return None
+    root = PBSNode(set(), root_solution)
+    best = root
+
+    stack = [root]
+    while stack and time.time() <= deadline:
+        node = stack.pop()
+        if not node.conflicts:
+            return node.solution
+        if (len(node.conflicts), node.cost) < (len(best.conflicts), best.cost):
+            best = node
+
+        conflict = node.conflicts[0]
+        children = []
+        for high, low in [(conflict['a1'], conflict['a2']), (conflict['a2'], conflict['a1'])]:
+            # the opposite priority is already implied
+            if low in higher_agents(node.priorities, high):
+                continue
+            priorities = node.priorities | {(high, low)}
+            solution = replan_below(node, priorities, low, starts, goals, heuristics)
+            if solution is not None:
+                children.append(PBSNode(priorities, solution))
+
+        # the cheapest child is explored first
+        children.sort(key=lambda child: child.cost, reverse=True)
+        stack.extend(children)
+    return best.solution
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import pickle
+import sqlite3
+import time
+from collections import OrderedDict
+from helpers import grid_scale_factor
+
+
+class PlanCache:
+    """
+    Cache of multi-agent plans, kept in memory for the current process and on disk in a SQLite file.
+
+    Plans are keyed on a hash of the starts, goals, grid bounds, planner and planner parameters.
+    Both layers evict the least recently used plans once they hold more than their size.
+    """
+
+    def __init__(self, path="plan_cache.sqlite", max_size=10000, memory_size=256):
+        """
+        path: SQLite file of the on-disk cache, None to only cache in memory
+        max_size: maximum number of plans on disk
+        memory_size: maximum number of plans in memory
+        """
+        self.path = path
+        self.max_size = max_size
+        self.memory_size = memory_size
+        self.memory = OrderedDict()  # key -> plan, from the least to the most recently used
+        self._connection = None
+
+    def __getstate__(self):
+        # connections cannot be pickled, processes open their own
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        return state
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS plans (key TEXT PRIMARY KEY, plan BLOB, last_used REAL)'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS plans_last_used ON plans (last_used)')
+            self._connection.commit()
+        return self._connection
+
+    @staticmethod
+    def key(starts, goals, planner, **params):
+        """
+        starts: dict mapping agents to their starting positions
+        goals: dict mapping agents to their goal positions
+        planner: name of the planner
+        params: planner parameters, they must be JSON serializable or numpy arrays
+
+        returns the canonical hash of the planning problem
+        """
+        problem = {
+            'starts': [[agent, [float(x) for x in starts[agent]]] for agent in sorted(starts)],
+            'goals': [[agent, [float(x) for x in goals[agent]]] for agent in sorted(goals)],
+            'grid_scale_factor': grid_scale_factor,
+            'planner': planner,
+            'params': params,
+        }
+        return hashlib.sha256(
+            json.dumps(problem, sort_keys=True, default=lambda array: array.tolist()).encode()
+        ).hexdigest()
+
+    def get(self, key):
+        """
+        returns the plan stored under key or None if there is none
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if self.path is None:
+            return None
+
+        row = self.connection.execute('SELECT plan FROM plans WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self.connection.execute('UPDATE plans SET last_used = ? WHERE key = ?', (time.time(), key))
+        self.connection.commit()
+        plan = pickle.loads(row[0])
+        self._remember(key, plan)
+        return plan
+
+    def put(self, key, plan):
+        """
+        stores plan under key
+        """
+        self._remember(key, plan)
+        if self.path is None:
+            return
+
+        self.connection.execute(
+            'INSERT OR REPLACE INTO plans (key, plan, last_used) VALUES (?, ?, ?)',
+            (key, pickle.dumps(plan), time.time()),
+        )
+        # evict the least recently used plans
+        self.connection.execute(
+            'DELETE FROM plans WHERE key IN '
+            '(SELECT key FROM plans ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+            (self.max_size,),
+        )
+        self.connection.commit()
+
+    def get_or_plan(self, planner, agents, starts, goals, **params):
+        """
+        planner: planning function called as planner(agents, starts, goals, **params), like cbs
+        agents: list of agent indices
+        starts: dict mapping agents to their starting positions
+        goals: dict mapping agents to their goal positions
+        params: keyword arguments of the planner
+
+        returns the cached plan of the problem, planning and caching it if it is not cached yet
+        """
+        key = self.key(starts, goals, planner.__name__, **params)
+        plan = self.get(key)
+        if plan is None:
+            plan = planner(agents, starts, goals, **params)
+            if plan is None:
+                return None
+            self.put(key, plan)
+        # the caller may modify the paths
+        return {agent: list(path) for agent, path in plan.items()}
+
+    def _remember(self, key, plan):
+        self.memory[key] = plan
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
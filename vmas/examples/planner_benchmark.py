@@ -0,0 +1,162 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import resource
+import statistics
+import tracemalloc
+from cbs import PlannerStats, cbs, compute_cost, ecbs
+from helpers import generate_random_positions, grid_scale_factor, seeds
+
+
+def planning_problem(seed, n_agents):
+    """
+    seed: seed of the instance, as in helpers.seeds
+    n_agents: number of agents
+
+    returns the agents, starts and goals of the instance in grid cells, as run_planning builds them
+    """
+    world_starts, world_goals = generate_random_positions(seed, n_agents)
+    agents = list(range(n_agents))
+    starts = {i: tuple(float(round(x * grid_scale_factor)) for x in world_starts[i]) for i in agents}
+    goals = {i: tuple(float(round(x * grid_scale_factor)) for x in world_goals[i]) for i in agents}
+    return agents, starts, goals
+
+
+def run_instance(planner, seed, n_agents, suboptimality, trace_memory, connection):
+    """
+    plans one instance and sends its result row through connection, run in a child process
+    """
+    if trace_memory:
+        tracemalloc.start()
+    agents, starts, goals = planning_problem(seed, n_agents)
+    stats = PlannerStats()
+    if planner == "ecbs":
+        solution = ecbs(agents, starts, goals, w=suboptimality, stats=stats)
+    else:
+        solution = cbs(agents, starts, goals, stats=stats)
+
+    row = {
+        "solved": solution is not None,
+        "cost": compute_cost(solution) if solution is not None else None,
+    }
+    row.update(stats.as_dict())
+    # kilobytes on Linux
+    row["max_rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    connection.send(row)
+    connection.close()
+
+
+def benchmark_instance(planner, seed, n_agents, suboptimality=1.5, timeout=None, trace_memory=False):
+    """
+    planner: "cbs" or "ecbs"
+    seed: seed of the instance
+    n_agents: number of agents
+    suboptimality: suboptimality factor of ecbs
+    timeout: seconds after which the planner is stopped, None for no limit
+    trace_memory: whether to measure the peak memory of the planner with tracemalloc, which slows it down
+
+    plans the instance in a separate process, so that it can be stopped and its memory is its own
+
+    returns the result row of the instance
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=run_instance,
+        args=(planner, seed, n_agents, suboptimality, trace_memory, sender),
+    )
+    process.start()
+    sender.close()
+
+    row = {"planner": planner, "n_agents": n_agents, "seed": seed, "timed_out": False}
+    if receiver.poll(timeout):
+        try:
+            row.update(receiver.recv())
+        except EOFError:
+            # the process died without a result
+            row["solved"] = False
+    else:
+        row.update({"timed_out": True, "solved": False})
+        process.terminate()
+    process.join()
+    receiver.close()
+    return row
+
+
+def run_benchmark(
+    planners=("cbs",),
+    agent_counts=None,
+    n_seeds=16,
+    suboptimality=1.5,
+    timeout=None,
+    trace_memory=False,
+    output="planner_benchmark",
+):
+    """
+    runs the planners on the seeds of helpers.seeds and writes one row per instance
+    to output.csv and output.json
+
+    returns the list of result rows
+    """
+    if agent_counts is None:
+        agent_counts = sorted(seeds)
+
+    rows = []
+    for planner in planners:
+        for n_agents in agent_counts:
+            instance_rows = [
+                benchmark_instance(planner, seed, n_agents, suboptimality, timeout, trace_memory)
+                for seed in seeds[n_agents][:n_seeds]
+            ]
+            rows += instance_rows
+
+            solved = [row for row in instance_rows if row["solved"]]
+            summary = (
+                f"{planner} {n_agents} agents: {len(solved)}/{len(instance_rows)} solved, "
+                f"{sum(row['timed_out'] for row in instance_rows)} timed out"
+            )
+            if solved:
+                summary += f", median time {statistics.median(row['total_time'] for row in solved):.3f}s"
+            print(summary)
+
+    # timed out rows have no statistics
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    with open(f"{output}.csv", mode="w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(f"{output}.json", mode="w") as file:
+        json.dump(rows, file, indent=2)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the multi-agent path finding planners on the seeds of the experiments"
+    )
+    parser.add_argument("--planners", nargs="+", default=["cbs"], choices=["cbs", "ecbs"])
+    parser.add_argument(
+        "--agents", nargs="+", type=int, default=None, help="Numbers of agents, defaults to all of them"
+    )
+    parser.add_argument("--seeds", type=int, default=16, help="Number of seeds per number of agents")
+    parser.add_argument("--suboptimality", type=float, default=1.5, help="Suboptimality factor of ecbs")
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds allowed per instance")
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Measure the peak memory of the planner with tracemalloc, this slows it down",
+    )
+    parser.add_argument(
+        "--output", default="planner_benchmark", help="Path of the results, without the .csv/.json extension"
+    )
+    args = parser.parse_args()
+
+    run_benchmark(
+        planners=args.planners,
+        agent_counts=args.agents,
+        n_seeds=args.seeds,
+        suboptimality=args.suboptimality,
+        timeout=args.timeout,
+        trace_memory=args.trace_memory,
+        output=args.output,
+    )
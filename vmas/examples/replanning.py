@@ -0,0 +1,174 @@
+import multiprocessing
+import time
+import torch
+from cbs import cell_index
+from path_smoothing import smooth_paths
+from helpers import (
+    grid_scale_factor,
+    replan_deviation,
+    replan_horizon,
+    replan_interval,
+    replan_timeout,
+)
+
+
+def snap_to_grid(positions):
+    """
+    positions: (..., 2) tensor of world positions
+
+    returns the (..., 2) grid cells nearest to the positions
+    """
+    return (positions * grid_scale_factor).round().clamp(-grid_scale_factor, grid_scale_factor)
+
+
+def predicted_conflicts(positions, velocities, distance, horizon=replan_horizon, n_samples=5):
+    """
+    positions: (num_envs, n_agents, 2) tensor of agent positions
+    velocities: (num_envs, n_agents, 2) tensor of agent velocities
+    distance: distance under which two agents are in conflict
+    horizon: seconds ahead that the agents are predicted for, at constant velocity
+
+    returns a (num_envs,) boolean tensor, True for the envs with two agents predicted
+    closer than distance within the horizon
+    """
+    times = torch.linspace(0, horizon, n_samples, device=positions.device)
+    # predicted[b, s, i] is agent i of env b at the time of sample s
+    predicted = positions.unsqueeze(1) + times.view(1, -1, 1, 1) * velocities.unsqueeze(1)
+    distances = torch.linalg.vector_norm(predicted.unsqueeze(3) - predicted.unsqueeze(2), dim=-1)
+    n_agents = positions.shape[1]
+    others = ~torch.eye(n_agents, dtype=torch.bool, device=positions.device)
+    return ((distances < distance) & others).flatten(1).any(dim=1)
+
+
+def run_planner(plan_function, agents, starts, goals, planner_params, connection):
+    """
+    plans one problem and sends the plan through connection, run in a child process
+    """
+    connection.send(plan_function(agents, starts, goals, **planner_params))
+    connection.close()
+
+
+class Replanner:
+    """
+    Receding-horizon replanning of the waypoint tracks. An env is replanned from the grid cells
+    nearest to its agents when one of them deviates from its track or two of them are predicted
+    to collide. The planner runs in a child process while the simulation goes on, and its plan
+    replaces the tracks of the env in the first step after it is ready.
+    """
+
+    def __init__(
+        self,
+        plan_function,
+        planner_params,
+        goals,
+        conflict_distance,
+        deviation=replan_deviation,
+        horizon=replan_horizon,
+        interval=replan_interval,
+        timeout=replan_timeout,
+    ):
+        """
+        plan_function: planner called as plan_function(agents, starts, goals, **params),
+            a module level function so that it can run in a child process
+        planner_params: list with, for each env, the keyword arguments of the planner
+        goals: (num_envs, n_agents, 2) tensor of the goal cells of the agents
+        conflict_distance: distance under which two agents are in conflict
+        deviation: distance from its track above which an agent triggers a replan
+        horizon: seconds ahead that conflicts are predicted for
+        interval: minimum number of steps between two replans of an env
+        timeout: seconds after which a replan that has not returned is dropped
+        """
+        self.plan_function = plan_function
+        self.planner_params = planner_params
+        self.goals = goals
+        self.conflict_distance = conflict_distance
+        self.deviation = deviation
+        self.horizon = horizon
+        self.interval = interval
+        self.timeout = timeout
+        self.agents = list(range(goals.shape[1]))
+        # env index -> (process, receiver, start time) of the replans running
+        self.pending = {}
+        self.last_request = [-interval] * goals.shape[0]
+        # number of plans swapped in
+        self.n_replans = 0
+
+    def update(self, step, positions, velocities, tracks):
+        """
+        step: index of the simulation step
+        positions: (num_envs, n_agents, 2) tensor of agent positions
+        velocities: (num_envs, n_agents, 2) tensor of agent velocities
+        tracks: WaypointTracks followed by the agents
+
+        swaps in the plans that are ready and starts the replans that are needed, without waiting
+        """
+        self.swap_ready_plans(positions, tracks)
+
+        deviating = tracks.deviation(positions).amax(dim=-1) > self.deviation
+        conflicting = predicted_conflicts(positions, velocities, self.conflict_distance, self.horizon)
+        for env_index in (deviating | conflicting).nonzero().flatten().tolist():
+            if env_index in self.pending or step - self.last_request[env_index] < self.interval:
+                continue
+            self.request(env_index, snap_to_grid(positions[env_index]))
+            self.last_request[env_index] = step
+
+    def request(self, env_index, cells):
+        """
+        env_index: index of the env to replan
+        cells: (n_agents, 2) tensor of the grid cells the agents are replanned from
+        """
+        starts = {i: tuple(cell) for i, cell in enumerate(cells.tolist())}
+        goals = {i: tuple(cell) for i, cell in enumerate(self.goals[env_index].tolist())}
+        # agents snapped to the same cell, or to a blocked one, have no plan
+        if len(set(starts.values())) < len(starts):
+            return
+        planner_params = self.planner_params[env_index]
+        blocked = planner_params.get("blocked")
+        if blocked is not None and any(blocked[cell_index(start)] for start in starts.values()):
+            return
+
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=run_planner,
+            args=(self.plan_function, self.agents, starts, goals, planner_params, sender),
+            daemon=True,
+        )
+        process.start()
+        sender.close()
+        self.pending[env_index] = (process, receiver, time.time())
+
+    def swap_ready_plans(self, positions, tracks):
+        for env_index, (process, receiver, start_time) in list(self.pending.items()):
+            if receiver.poll():
+                try:
+                    plan = receiver.recv()
+                except EOFError:
+                    # the process died without a plan
+                    plan = None
+            elif time.time() - start_time > self.timeout:
+                plan = None
+                process.terminate()
+            else:
+                continue
+            process.join()
+            receiver.close()
+            del self.pending[env_index]
+
+            if plan is not None:
+                waypoints, _, _ = smooth_paths(
+                    [plan[i] for i in self.agents],
+                    n_waypoints=tracks.waypoints.shape[2],
+                    device=positions.device,
+                )
+                tracks.replace(env_index, waypoints / grid_scale_factor, positions[env_index])
+                self.n_replans += 1
+
+    def close(self):
+        """
+        stops the replans still running
+        """
+        for process, receiver, _ in self.pending.values():
+            process.terminate()
+            process.join()
+            receiver.close()
+        self.pending = {}
@@ -0,0 +1,81 @@
+import os
+import numpy as np
+
+
+class ResultWriter:
+    """
+    Buffered writer of experiment results to a columnar store: a directory of .npz
+    files, each holding one array per column for a chunk of rows.
+    """
+
+    def __init__(self, path="results", buffer_size=32):
+        """
+        path: directory of the store, created if it does not exist
+        buffer_size: number of rows kept in memory before they are written
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer = []
+        os.makedirs(path, exist_ok=True)
+        self.n_chunks = len(chunk_files(path))
+
+    def write(self, row):
+        """
+        row: dict mapping column names to scalar values, with the same columns for all rows
+        """
+        self.buffer.append(row)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        columns = {name: np.array([row[name] for row in self.buffer]) for name in self.buffer[0]}
+        file = os.path.join(self.path, f"part-{self.n_chunks:05d}.npz")
+        # the chunk is renamed once complete, so an interrupted write leaves no partial chunk
+        temporary = file + ".tmp"
+        with open(temporary, "wb") as f:
+            np.savez(f, **columns)
+        os.replace(temporary, file)
+        self.n_chunks += 1
+        self.buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+def chunk_files(path):
+    """
+    returns the chunk files of the store at path, in the order they were written
+    """
+    if not os.path.isdir(path):
+        return []
+    return sorted(
+        os.path.join(path, name) for name in os.listdir(path) if name.startswith("part-") and name.endswith(".npz")
+    )
+
+
+def load_results(path="results"):
+    """
+    returns a dict mapping the columns of the store at path to arrays with all its rows
+    """
+    chunks = []
+    for file in chunk_files(path):
+        with np.load(file, allow_pickle=False) as chunk:
+            chunks.append({name: chunk[name] for name in chunk.files})
+    if not chunks:
+        return {}
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+
+def completed_keys(path="results", key_columns=("method", "seed", "n_agents")):
+    """
+    returns the set of key_columns tuples of the rows already in the store at path
+    """
+    results = load_results(path)
+    if not results:
+        return set()
+    return set(zip(*(results[column].tolist() for column in key_columns)))
@@ -8,7 +8,7 @@ import torch
 
 from vmas import make_env
 from vmas.simulator.heuristic_policy import BaseHeuristicPolicy, RandomPolicy
-from vmas.simulator.utils import save_video
+from vmas.simulator.utils import VideoWriter
 
 
 def run_heuristic(
@@ -38,7 +38,12 @@ def run_heuristic(
         **env_kwargs,
     )
 
-    frame_list = []  # For creating a gif
+    # Frames are encoded while the simulation runs
+    video = (
+        VideoWriter(scenario_name, fps=1 / env.scenario.world.dt)
+        if render and save_render
+        else None
+    )
     init_time = time.time()
     step = 0
     obs = env.reset()
@@ -54,17 +59,16 @@ def run_heuristic(
         mean_global_reward = global_reward.mean(dim=0)
         total_reward += mean_global_reward
         if render:
-            frame_list.append(
-                env.render(
-                    mode="rgb_array",
-                    agent_index_focus=None,
-                    visualize_when_rgb=True,
-                )
+            env.render(
+                mode="rgb_array",
+                agent_index_focus=None,
+                visualize_when_rgb=True,
+                sink=video,
             )
 
     total_time = time.time() - init_time
-    if render and save_render:
-        save_video(scenario_name, frame_list, 1 / env.scenario.world.dt)
+    if video is not None:
+        video.close()
 
     print(
         f"It took: {total_time}s for {n_steps} steps of {n_envs} parallel environments on device {device}\n"
@@ -0,0 +1,97 @@
+import torch
+from helpers import following_distance
+
+
+class WaypointTracks:
+    """
+    Waypoints of all the agents of all the envs, held in one tensor and consumed by
+    moving a progress index along each track.
+    """
+
+    def __init__(self, waypoints, lengths=None):
+        """
+        waypoints: (num_envs, n_agents, K, 2) tensor of world positions, tracks shorter
+            than K are padded at their end
+        lengths: (num_envs, n_agents) tensor with the number of waypoints of each track,
+            defaults to K for all of them
+        """
+        self.waypoints = waypoints
+        if lengths is None:
+            lengths = torch.full(waypoints.shape[:2], waypoints.shape[2], device=waypoints.device)
+        self.lengths = lengths.to(device=waypoints.device, dtype=torch.long)
+        # index of the waypoint each agent is moving to
+        self.progress = torch.zeros(waypoints.shape[:2], device=waypoints.device, dtype=torch.long)
+
+    @classmethod
+    def from_paths(cls, paths, num_envs=1, device="cpu", scale=1.0):
+        """
+        paths: list with the path of each agent, a sequence of (x, y) positions
+        num_envs: number of envs that follow the same paths
+        scale: factor dividing the positions, like grid_scale_factor for grid paths
+
+        returns the tracks of the paths, shared by the envs
+        """
+        n_waypoints = max(len(path) for path in paths)
+        # short paths are padded with their last position
+        padded = [list(path) + [path[-1]] * (n_waypoints - len(path)) for path in paths]
+        waypoints = torch.tensor(padded, device=device, dtype=torch.float32) / scale
+        lengths = torch.tensor([len(path) for path in paths], device=device)
+        return cls(
+            waypoints.expand(num_envs, -1, -1, -1),
+            lengths.expand(num_envs, -1),
+        )
+
+    def targets(self):
+        """
+        returns the (num_envs, n_agents, 2) waypoints the agents are moving to
+        """
+        index = self.progress[..., None, None].expand(-1, -1, 1, self.waypoints.shape[-1])
+        return self.waypoints.gather(2, index).squeeze(2)
+
+    def final(self):
+        """
+        returns a (num_envs, n_agents) boolean tensor, True for the agents moving to their last waypoint
+        """
+        return self.progress >= self.lengths - 1
+
+    def advance(self, positions, distance=following_distance):
+        """
+        positions: (num_envs, n_agents, 2) tensor of agent positions
+
+        moves the agents closer than distance to their waypoint on to the next one
+        """
+        reached = torch.linalg.vector_norm(self.targets() - positions, dim=-1) < distance
+        self.progress = torch.where(reached & ~self.final(), self.progress + 1, self.progress)
+
+    def deviation(self, positions):
+        """
+        positions: (num_envs, n_agents, 2) tensor of agent positions
+
+        returns the (num_envs, n_agents) distances of the agents to the segments of their
+        tracks from their previous waypoint to the one they are moving to
+        """
+        targets = self.targets()
+        index = (self.progress - 1).clamp(min=0)[..., None, None].expand(-1, -1, 1, self.waypoints.shape[-1])
+        previous = self.waypoints.gather(2, index).squeeze(2)
+        segment = targets - previous
+        t = ((positions - previous) * segment).sum(dim=-1) / (segment**2).sum(dim=-1).clamp(min=1e-12)
+        closest = previous + t.clamp(0, 1).unsqueeze(-1) * segment
+        return torch.linalg.vector_norm(positions - closest, dim=-1)
+
+    def replace(self, env_index, waypoints, positions):
+        """
+        env_index: index of the env whose tracks are replaced
+        waypoints: (n_agents, K, 2) tensor of the new waypoints, with the same K as the tracks
+        positions: (n_agents, 2) tensor with the positions of the agents of the env
+
+        swaps in new tracks for one env, its agents move on from the waypoints nearest to them
+        """
+        # tracks shared by the envs are views of one tensor, each env gets its own copy
+        if self.waypoints.stride(0) == 0:
+            self.waypoints = self.waypoints.clone()
+        if self.lengths.stride(0) == 0:
+            self.lengths = self.lengths.clone()
+        self.waypoints[env_index] = waypoints
+        self.lengths[env_index] = waypoints.shape[1]
+        distances = torch.linalg.vector_norm(waypoints - positions.unsqueeze(1), dim=-1)
+        self.progress[env_index] = distances.argmin(dim=-1)
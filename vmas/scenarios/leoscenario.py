@@ -19,10 +19,9 @@ from vmas.examples.helpers import (
     num_agents,
     grid_scale_factor,
     seed,
+    generate_random_positions,
 )
 
-from vmas.examples.runtest import starts, goals
-
 if typing.TYPE_CHECKING:
     from vmas.simulator.rendering import Geom
 
@@ -84,6 +83,11 @@ class Scenario(BaseScenario):
         self.final_reward = kwargs.pop("final_reward", 0.01)
 
         self.agent_collision_penalty = kwargs.pop("agent_collision_penalty", -1)
+
+        # (num_envs, n_agents, 2) or, shared by all the envs, (n_agents, 2) positions
+        default_starts, default_goals = generate_random_positions(seed, self.n_agents)
+        starts = kwargs.pop("starts", default_starts)
+        goals = kwargs.pop("goals", default_goals)
         ScenarioUtils.check_kwargs_consumed(kwargs)
 
         self.min_distance_between_entities = self.agent_radius * 2 + 0.05
@@ -177,15 +181,40 @@ class Scenario(BaseScenario):
         self.pos_rew = torch.zeros(batch_dim, device=device)
         self.final_rew = self.pos_rew.clone()
 
+        self.starts = self.batch_positions(starts, batch_dim, device)
+        self.goals = self.batch_positions(goals, batch_dim, device)
+
         return world
 
+    def batch_positions(self, positions, batch_dim: int, device: torch.device):
+        positions = torch.as_tensor(positions, dtype=torch.float32, device=device)
+        if positions.dim() == 2:
+            positions = positions.unsqueeze(0).expand(batch_dim, -1, -1)
+        assert positions.shape == (
+            batch_dim,
+            self.n_agents,
+            2,
+        ), f"Expected positions of shape ({batch_dim}, {self.n_agents}, 2) or ({self.n_agents}, 2), got {tuple(positions.shape)}"
+        return positions
+
+    def set_starts_and_goals(self, starts, goals):
+        """Sets the starts and goals that the following resets place the agents and goals at,
+        so that one batched environment can run a different problem in each env.
+
+        Args:
+            starts: (num_envs, n_agents, 2) or, shared by all the envs, (n_agents, 2) positions
+            goals: Goal positions, with the same shape as ``starts``
+        """
+        self.starts = self.batch_positions(starts, self.world.batch_dim, self.world.device)
+        self.goals = self.batch_positions(goals, self.world.batch_dim, self.world.device)
+
     def reset_world_at(self, env_index: int = None):
 
-        # start positions
-        fixed_positions = [torch.tensor([start]) for start in starts]        
+        # start positions, of all the envs or of the one at env_index
+        fixed_positions = self.starts if env_index is None else self.starts[env_index].unsqueeze(0)
 
         for i, agent in enumerate(self.world.agents):
-            agent.set_pos(fixed_positions[i], batch_index=env_index)
+            agent.set_pos(fixed_positions[:, i], batch_index=env_index)
 
         occupied_positions = torch.stack(
             [agent.state.pos for agent in self.world.agents], dim=1
@@ -194,8 +223,7 @@ class Scenario(BaseScenario):
             occupied_positions = occupied_positions[env_index].unsqueeze(0)
 
         # goal positions
-        goal_poses = [torch.tensor([goal]) for goal in goals]
-
+        goal_poses = self.goals if env_index is None else self.goals[env_index].unsqueeze(0)
 
         for i, agent in enumerate(self.world.agents):
             if self.split_goals:
@@ -203,7 +231,7 @@ class Scenario(BaseScenario):
             else:
                 goal_index = 0 if i < self.agents_with_same_goal else i
 
-            agent.goal.set_pos(goal_poses[goal_index], batch_index=env_index)
+            agent.goal.set_pos(goal_poses[:, goal_index], batch_index=env_index)
 
             if env_index is None:
                 agent.pos_shaping = (
@@ -225,48 +253,54 @@ class Scenario(BaseScenario):
         is_first = agent == self.world.agents[0]
 
         if is_first:
-            self.pos_rew[:] = 0
-            self.final_rew[:] = 0
-
-            for a in self.world.agents:
-                self.pos_rew += self.agent_reward(a)
-                a.agent_collision_rew[:] = 0
+            # all the agents at once: (batch_dim, n_agents, 2) positions
+            agents_pos = torch.stack([a.state.pos for a in self.world.agents], dim=1)
+            goals_pos = torch.stack(
+                [a.goal.state.pos for a in self.world.agents], dim=1
+            )
+            goal_radius = torch.tensor(
+                [a.goal.shape.radius for a in self.world.agents],
+                device=self.world.device,
+            )
 
-            self.all_goal_reached = torch.all(
-                torch.stack([a.on_goal for a in self.world.agents], dim=-1),
-                dim=-1,
+            distance_to_goal = torch.linalg.vector_norm(agents_pos - goals_pos, dim=-1)
+            on_goal = distance_to_goal < goal_radius
+            pos_shaping = distance_to_goal * self.pos_shaping_factor
+            pos_rew = (
+                torch.stack([a.pos_shaping for a in self.world.agents], dim=-1)
+                - pos_shaping
             )
 
+            self.pos_rew[:] = pos_rew.sum(dim=-1)
+            self.all_goal_reached = on_goal.all(dim=-1)
+            self.final_rew[:] = 0
             self.final_rew[self.all_goal_reached] = self.final_reward
 
+            # distance between the surfaces of each pair of agents
+            distance = torch.linalg.vector_norm(
+                agents_pos.unsqueeze(2) - agents_pos.unsqueeze(1), dim=-1
+            ) - 2 * self.agent_radius
+            # as World.collides, the pairs of distinct agents touching in at least one env are checked
+            can_collide = (distance <= 0).any(dim=0) & ~torch.eye(
+                self.n_agents, dtype=torch.bool, device=self.world.device
+            )
+            colliding = (
+                (distance <= self.min_collision_distance) & can_collide & self.collisions
+            )
+            agent_collision_rew = (
+                colliding.to(self.pos_rew.dtype).sum(dim=-1) * self.agent_collision_penalty
+            )
+
             for i, a in enumerate(self.world.agents):
-                for j, b in enumerate(self.world.agents):
-                    if i <= j:
-                        continue
-                    if self.world.collides(a, b):
-                        distance = self.world.get_distance(a, b)
-                        a.agent_collision_rew[
-                            distance <= self.min_collision_distance
-                        ] += self.agent_collision_penalty
-                        b.agent_collision_rew[
-                            distance <= self.min_collision_distance
-                        ] += self.agent_collision_penalty
+                a.distance_to_goal = distance_to_goal[:, i]
+                a.on_goal = on_goal[:, i]
+                a.pos_rew = pos_rew[:, i]
+                a.pos_shaping = pos_shaping[:, i]
+                a.agent_collision_rew = agent_collision_rew[:, i]
 
         pos_reward = self.pos_rew if self.shared_rew else agent.pos_rew
         return pos_reward + self.final_rew + agent.agent_collision_rew
 
-    def agent_reward(self, agent: Agent):
-        agent.distance_to_goal = torch.linalg.vector_norm(
-            agent.state.pos - agent.goal.state.pos,
-            dim=-1,
-        )
-        agent.on_goal = agent.distance_to_goal < agent.goal.shape.radius
-
-        pos_shaping = agent.distance_to_goal * self.pos_shaping_factor
-        agent.pos_rew = agent.pos_shaping - pos_shaping
-        agent.pos_shaping = pos_shaping
-        return agent.pos_rew
-
     def observation(self, agent: Agent):
         goal_poses = []
         if self.observe_all_goals:
@@ -312,6 +346,9 @@ class Scenario(BaseScenario):
         from vmas.simulator import rendering
 
         geoms: List[Geom] = []
+        if not hasattr(self, "_comms_lines"):
+            # Lines are created once per pair and reused in later frames
+            self._comms_lines = {}
 
         # Communication lines
         for i, agent1 in enumerate(self.world.agents):
@@ -319,18 +356,16 @@ class Scenario(BaseScenario):
                 if j <= i:
                     continue
                 agent_dist = torch.linalg.vector_norm(
-                    agent1.state.pos - agent2.state.pos, dim=-1
+                    agent1.state.pos[env_index] - agent2.state.pos[env_index], dim=-1
                 )
-                if agent_dist[env_index] <= self.comms_range:
-                    color = Color.BLACK.value
-                    line = rendering.Line(
-                        (agent1.state.pos[env_index]),
-                        (agent2.state.pos[env_index]),
-                        width=1,
-                    )
-                    xform = rendering.Transform()
-                    line.add_attr(xform)
-                    line.set_color(*color)
+                if agent_dist <= self.comms_range:
+                    if (i, j) not in self._comms_lines:
+                        line = rendering.Line(width=1)
+                        line.set_color(*Color.BLACK.value)
+                        self._comms_lines[(i, j)] = line
+                    line = self._comms_lines[(i, j)]
+                    line.start = tuple(agent1.state.pos[env_index].tolist())
+                    line.end = tuple(agent2.state.pos[env_index].tolist())
                     geoms.append(line)
 
         return geoms
@@ -1,7 +1,7 @@
 #  Copyright (c) 2023-2024.
 #  ProrokLab (https://www.proroklab.org/)
 #  All rights reserved.
-from typing import Callable, Dict
+from typing import Callable, Dict, Optional
 
 import torch
 from torch import Tensor
@@ -96,6 +96,10 @@ class Scenario(BaseScenario):
             torch.zeros((batch_dim, world.dim_p), device=device, dtype=torch.float32)
             for _ in range(self.n_gaussians)
         ]
+        # Bumped whenever the density changes, to know when its plot has to be updated
+        self._density_version = 0
+        self._density_plot = None
+
         self.cov_matrices = [
             torch.tensor(
                 [[cov, 0], [0, cov]], dtype=torch.float32, device=device
@@ -131,6 +135,7 @@ class Scenario(BaseScenario):
             for loc, cov_matrix in zip(self.locs, self.cov_matrices)
         ]
 
+        self._density_version += 1
         if env_index is None:
             self.max_pdf[:] = 0
             self.sampled[:] = False
@@ -200,6 +205,7 @@ class Scenario(BaseScenario):
 
         v[sampled + out_of_bounds] = 0
         if update_sampled_flag:
+            self._density_version += 1
             self.sampled[
                 torch.arange(self.world.batch_dim), index[:, 0], index[:, 1]
             ] = True
@@ -209,7 +215,7 @@ class Scenario(BaseScenario):
     def sample_single_env(
         self,
         pos,
-        env_index,
+        env_index: Optional[int],
         norm: bool = True,
     ):
         pos = pos.view(-1, self.world.dim_p)
@@ -233,11 +239,18 @@ class Scenario(BaseScenario):
         v = torch.stack(
             [gaussian.log_prob(pos).exp() for gaussian in self.gaussians],
             dim=-1,
-        ).sum(-1)[:, env_index]
+        ).sum(-1)
+        if env_index is None:
+            # Values in all environments, with shape (n_envs, n_points)
+            v = v.transpose(0, 1)
+            max_pdf = self.max_pdf.unsqueeze(-1)
+            sampled = self.sampled[:, index[:, 0], index[:, 1]]
+        else:
+            v = v[:, env_index]
+            max_pdf = self.max_pdf[env_index]
+            sampled = self.sampled[env_index, index[:, 0], index[:, 1]]
         if norm:
-            v = v / self.max_pdf[env_index]
-
-        sampled = self.sampled[env_index, index[:, 0], index[:, 1]]
+            v = v / max_pdf
 
         v[sampled + out_of_bounds] = 0
 
@@ -313,10 +326,10 @@ class Scenario(BaseScenario):
     def info(self, agent: Agent) -> Dict[str, Tensor]:
         return {"agent_sample": agent.sample}
 
-    def density_for_plot(self, env_index):
+    def density_for_plot(self, env_index: Optional[int]):
         def f(x):
             sample = self.sample_single_env(
-                torch.tensor(x, dtype=torch.float32, device=self.world.device),
+                torch.as_tensor(x, dtype=torch.float32, device=self.world.device),
                 env_index=env_index,
             )
 
@@ -326,14 +339,19 @@ class Scenario(BaseScenario):
 
     def extra_render(self, env_index: int = 0):
         from vmas.simulator import rendering
-        from vmas.simulator.rendering import render_function_util
 
-        # Function
+        # Function, evaluated for all environments only when the density changes
+        if self._density_plot is None:
+            self._density_plot = rendering.FunctionPlotCache()
         geoms = [
-            render_function_util(
-                f=self.density_for_plot(env_index=env_index),
+            self._density_plot.get(
+                f=self.density_for_plot(env_index=None),
                 plot_range=(self.xdim, self.ydim),
                 cmap_alpha=self.alpha_plot,
+                version=self._density_version,
+                batched=True,
+                env_index=env_index,
+                device=self.world.device,
             )
         ]
 
@@ -602,6 +602,10 @@ class Entity(TorchVectorizedObject, Observable, ABC):
         self._goal = None
         # Render the entity
         self._render = None
+        # Geometry retained across renders, rebuilt only if the shape changes
+        self._render_geom = None
+        self._render_xform = None
+        self._render_geom_shape = None
 
     @TorchVectorizedObject.batch_dim.setter
     def batch_dim(self, batch_dim: int):
@@ -769,11 +773,15 @@ class Entity(TorchVectorizedObject, Observable, ABC):
 
         if not self.is_rendering[env_index]:
             return []
-        geom = self.shape.get_geometry()
-        xform = rendering.Transform()
-        geom.add_attr(xform)
-
-        xform.set_translation(*self.state.pos[env_index])
+        if self._render_geom is None or self._render_geom_shape is not self.shape:
+            self._render_geom = self.shape.get_geometry()
+            self._render_xform = rendering.Transform()
+            self._render_geom.add_attr(self._render_xform)
+            self._render_geom_shape = self.shape
+        geom = self._render_geom
+        xform = self._render_xform
+
+        xform.set_translation(*self.state.pos[env_index].tolist())
         xform.set_rotation(self.state.rot[env_index])
 
         color = self.color
@@ -924,6 +932,8 @@ class Agent(Entity):
         self._adversary = adversary
         # Render alpha
         self._alpha = alpha
+        # Action force line retained across renders
+        self._render_action_geom = None
 
         # Dynamics
         self.dynamics = dynamics if dynamics is not None else Holonomic()
@@ -1073,11 +1083,17 @@ class Agent(Entity):
             for sensor in self._sensors:
                 geoms += sensor.render(env_index=env_index)
         if self._render_action and self.state.force is not None:
-            velocity = rendering.Line(
-                self.state.pos[env_index],
-                self.state.pos[env_index]
-                + self.state.force[env_index] * 10 * self.shape.circumscribed_radius(),
-                width=2,
+            if self._render_action_geom is None:
+                self._render_action_geom = rendering.Line(width=2)
+            velocity = self._render_action_geom
+            velocity.start = tuple(self.state.pos[env_index].tolist())
+            velocity.end = tuple(
+                (
+                    self.state.pos[env_index]
+                    + self.state.force[env_index]
+                    * 10
+                    * self.shape.circumscribed_radius()
+                ).tolist()
             )
             velocity.set_color(*self.color)
             geoms.append(velocity)
@@ -2784,7 +2800,8 @@ class World(TorchVectorizedObject):
                     torque_b[:, i],
                 )
 
-    def collides(self, a: Entity, b: Entity) -> bool:
+    def _can_collide(self, a: Entity, b: Entity) -> bool:
+        """Whether a and b can collide, independently of their positions"""
         if (not a.collides(b)) or (not b.collides(a)) or a is b:
             return False
         a_shape = a.shape
@@ -2793,6 +2810,11 @@ class World(TorchVectorizedObject):
             return False
         if not {a_shape.__class__, b_shape.__class__} in self._collidable_pairs:
             return False
+        return True
+
+    def collides(self, a: Entity, b: Entity) -> bool:
+        if not self._can_collide(a, b):
+            return False
         if not (
             torch.linalg.vector_norm(a.state.pos - b.state.pos, dim=-1)
             <= a.shape.circumscribed_radius() + b.shape.circumscribed_radius()
@@ -2801,6 +2823,33 @@ class World(TorchVectorizedObject):
 
         return True
 
+    def get_collision_mask(self, entities: List[Entity] = None) -> Tensor:
+        """Batched version of :meth:`collides` for all the pairs of entities, evaluated in each env.
+
+        Args:
+            entities (List[Entity], optional): Entities to check. Defaults to the agents of the world.
+
+        Returns:
+            A boolean tensor of shape ``(batch_dim, n_entities, n_entities)``, symmetric and ``False``
+            on the diagonal, that is ``True`` where two entities can collide and their circumscribed
+            circles touch in that env
+        """
+        if entities is None:
+            entities = self.agents
+        can_collide = torch.tensor(
+            [[self._can_collide(a, b) for b in entities] for a in entities],
+            device=self.device,
+            dtype=torch.bool,
+        )
+        radius = torch.tensor(
+            [entity.shape.circumscribed_radius() for entity in entities],
+            device=self.device,
+            dtype=torch.float32,
+        )
+        pos = torch.stack([entity.state.pos for entity in entities], dim=1)
+        dist = torch.linalg.vector_norm(pos.unsqueeze(2) - pos.unsqueeze(1), dim=-1)
+        return (dist <= radius.unsqueeze(1) + radius.unsqueeze(0)) & can_collide
+
     def _get_constraint_forces(
         self,
         pos_a: Tensor,
@@ -5,7 +5,16 @@ import contextlib
 import math
 import random
 from ctypes import byref
-from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+from typing import (
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import torch
@@ -108,6 +117,10 @@ class Environment(TorchVectorizedObject):
         self.headless = None
         self.visible_display = None
         self.text_lines = None
+        self._rasterizer = None
+        self._grid_geom = None
+        self._function_plot_cache = None
+        self._boundary_geoms = None
 
     @local_seed(vmas_random_state)
     def reset(
@@ -766,6 +779,9 @@ class Environment(TorchVectorizedObject):
         plot_position_function_cmap_range: Optional[Tuple[float, float]] = None,
         plot_position_function_cmap_alpha: Optional[float] = 1.0,
         plot_position_function_cmap_name: Optional[str] = "viridis",
+        plot_position_function_version: Optional[Hashable] = None,
+        plot_position_function_batched: bool = False,
+        sink=None,
     ):
         """
         Render function for environment using pyglet
@@ -792,6 +808,13 @@ class Environment(TorchVectorizedObject):
         If Tuple[Tuple[float, float], Tuple[float, float]], the first tuple is the x range and the second tuple is the y range
         :param plot_position_function_cmap_range: The range of the cmap in case plot_position_function outputs a single value
         :param plot_position_function_cmap_alpha: The alpha of the cmap in case plot_position_function outputs a single value
+        :param plot_position_function_version: A hashable key identifying the current values of plot_position_function.
+        If not None, the function and its image are computed only when the key or the plotting parameters change
+        and reused otherwise. If None, the function is evaluated at every call
+        :param plot_position_function_batched: If True, plot_position_function takes a tensor with shape (n_points, 2) on the environment device
+        and returns the values for all environments, with shape (n_envs, n_points) or (n_envs, n_points, 4).
+        Together with plot_position_function_version, this evaluates the function once for all the rendered environments
+        :param sink: An object with a ``write(frame)`` method, like :class:`~vmas.simulator.utils.VideoWriter`, that receives the rgb array when mode=="rgb_array"
         :return: Rgb array or None, depending on the mode
 
         """
@@ -804,9 +827,126 @@ class Environment(TorchVectorizedObject):
                 f"Agent focus in rendering should be a valid agent index"
                 f" between 0 and {self.n_agents}, got {agent_index_focus}"
             )
-        shared_viewer = agent_index_focus is None
-        aspect_ratio = self.scenario.viewer_size[X] / self.scenario.viewer_size[Y]
+        self._prepare_viewer(mode, visualize_when_rgb)
+
+        bounds = self._get_camera_bounds(
+            torch.tensor([env_index], device=self.device), agent_index_focus
+        )[0]
+        self.viewer.set_bounds(*bounds)
+
+        # Render
+        if self.scenario.visualize_semidims:
+            self.plot_boundary()
+
+        self._set_agent_comm_messages(env_index)
+
+        if plot_position_function is not None:
+            self.viewer.add_onetime(
+                self.plot_function(
+                    plot_position_function,
+                    precision=plot_position_function_precision,
+                    plot_range=plot_position_function_range,
+                    cmap_range=plot_position_function_cmap_range,
+                    cmap_alpha=plot_position_function_cmap_alpha,
+                    cmap_name=plot_position_function_cmap_name,
+                    version=plot_position_function_version,
+                    batched=plot_position_function_batched,
+                    env_index=env_index,
+                )
+            )
+
+        self.viewer.add_onetime_list(self._get_scene_geoms(env_index))
+
+        # render to display or array
+        frame = self.viewer.render(return_rgb_array=mode == "rgb_array")
+        if sink is not None and frame is not None:
+            sink.write(frame)
+        return frame
+
+    @local_seed(vmas_random_state)
+    def render_tiled(
+        self,
+        env_indices: Optional[Sequence[int]] = None,
+        grid: Optional[Tuple[int, int]] = None,
+        mode="rgb_array",
+        agent_index_focus: int = None,
+        visualize_when_rgb: bool = False,
+        sink=None,
+    ):
+        """
+        Render several environments tiled in a single frame using pyglet
+
+        All tiles are drawn in one viewport pass and read back with a single framebuffer read,
+        and the cameras of all environments are fitted in one vectorized call.
+        Agent comm messages are not drawn in the tiles.
+
+        :param env_indices: Indices of the environments to render, in row-major tile order. If None, all environments are rendered
+        :param grid: Number of (rows, columns) of the tiles. If None, the most square grid that fits all environments is used
+        :param mode: One of human or rgb_array
+        :param agent_index_focus: If specified the cameras will stay on the agent with this index. If None, the cameras will stay in the center and zoom out to contain all agents
+        :param visualize_when_rgb: Also run human visualization when mode=="rgb_array"
+        :param sink: An object with a ``write(frame)`` method, like :class:`~vmas.simulator.utils.VideoWriter`, that receives the rgb array when mode=="rgb_array"
+        :return: Rgb array of the whole viewer or None, depending on the mode
 
+        """
+        if env_indices is None:
+            env_indices = range(self.num_envs)
+        env_indices = list(env_indices)
+        assert len(env_indices) > 0, "Need at least one environment to render"
+        for env_index in env_indices:
+            self._check_batch_index(env_index)
+        assert (
+            mode in self.metadata["render.modes"]
+        ), f"Invalid mode {mode} received, allowed modes: {self.metadata['render.modes']}"
+        if agent_index_focus is not None:
+            assert 0 <= agent_index_focus < self.n_agents, (
+                f"Agent focus in rendering should be a valid agent index"
+                f" between 0 and {self.n_agents}, got {agent_index_focus}"
+            )
+        if grid is None:
+            cols = math.ceil(math.sqrt(len(env_indices)))
+            rows = math.ceil(len(env_indices) / cols)
+        else:
+            rows, cols = grid
+            assert rows * cols >= len(
+                env_indices
+            ), f"A grid of {rows}x{cols} tiles cannot fit {len(env_indices)} environments"
+
+        self._prepare_viewer(mode, visualize_when_rgb)
+
+        width, height = self.viewer.width, self.viewer.height
+        tile_width, tile_height = width / cols, height / rows
+        all_bounds = self._get_camera_bounds(
+            torch.tensor(env_indices, device=self.device),
+            agent_index_focus,
+            aspect_ratio=tile_width / tile_height,
+        )
+
+        def tiles():
+            for i, (env_index, bounds) in enumerate(zip(env_indices, all_bounds)):
+                row, col = divmod(i, cols)
+                viewport = (
+                    col * tile_width,
+                    height - (row + 1) * tile_height,
+                    tile_width,
+                    tile_height,
+                )
+                geoms = (
+                    self._get_boundary_geoms()
+                    if self.scenario.visualize_semidims
+                    else []
+                )
+                # Entities retain their geometries, so they are fetched only when their tile is drawn
+                yield viewport, bounds, geoms + self._get_scene_geoms(env_index)
+
+        frame = self.viewer.render_tiles(
+            tiles(), return_rgb_array=mode == "rgb_array"
+        )
+        if sink is not None and frame is not None:
+            sink.write(frame)
+        return frame
+
+    def _prepare_viewer(self, mode: str, visualize_when_rgb: bool):
         headless = mode == "rgb_array" and not visualize_when_rgb
         # First time rendering
         if self.visible_display is None:
@@ -842,134 +982,150 @@ class Environment(TorchVectorizedObject):
 
             self._init_rendering()
 
-        if self.scenario.viewer_zoom <= 0:
-            raise ValueError("Scenario viewer zoom must be > 0")
-        zoom = self.scenario.viewer_zoom
-
-        if aspect_ratio < 1:
-            cam_range = torch.tensor([zoom, zoom / aspect_ratio], device=self.device)
-        else:
-            cam_range = torch.tensor([zoom * aspect_ratio, zoom], device=self.device)
+    def _get_scene_geoms(self, env_index: int) -> List:
+        """Returns the grid, scenario and entity geometries of an environment"""
+        from vmas.simulator.rendering import Grid
 
-        if shared_viewer:
-            # zoom out to fit everyone
-            all_poses = torch.stack(
-                [agent.state.pos[env_index] for agent in self.world.agents],
-                dim=0,
-            )
-            max_agent_radius = max(
-                [agent.shape.circumscribed_radius() for agent in self.world.agents]
-            )
-            viewer_size_fit = (
-                torch.stack(
-                    [
-                        torch.max(
-                            torch.abs(all_poses[:, X] - self.scenario.render_origin[X])
-                        ),
-                        torch.max(
-                            torch.abs(all_poses[:, Y] - self.scenario.render_origin[Y])
-                        ),
-                    ]
+        geoms = []
+        if self.scenario.plot_grid:
+            if (
+                self._grid_geom is None
+                or self._grid_geom.spacing != self.scenario.grid_spacing
+            ):
+                self._grid_geom = Grid(spacing=self.scenario.grid_spacing)
+                self._grid_geom.set_color(
+                    *vmas.simulator.utils.Color.BLACK.value, alpha=0.3
                 )
-                + 2 * max_agent_radius
-            )
+            geoms.append(self._grid_geom)
 
-            viewer_size = torch.maximum(
-                viewer_size_fit / cam_range,
-                torch.tensor(zoom, device=self.device),
-            )
-            cam_range *= torch.max(viewer_size)
-            self.viewer.set_bounds(
-                -cam_range[X] + self.scenario.render_origin[X],
-                cam_range[X] + self.scenario.render_origin[X],
-                -cam_range[Y] + self.scenario.render_origin[Y],
-                cam_range[Y] + self.scenario.render_origin[Y],
-            )
-        else:
-            # update bounds to center around agent
-            pos = self.agents[agent_index_focus].state.pos[env_index]
-            self.viewer.set_bounds(
-                pos[X] - cam_range[X],
-                pos[X] + cam_range[X],
-                pos[Y] - cam_range[Y],
-                pos[Y] + cam_range[Y],
-            )
-
-        # Render
-        if self.scenario.visualize_semidims:
-            self.plot_boundary()
+        geoms += self.scenario.extra_render(env_index)
 
-        self._set_agent_comm_messages(env_index)
-
-        if plot_position_function is not None:
-            self.viewer.add_onetime(
-                self.plot_function(
-                    plot_position_function,
-                    precision=plot_position_function_precision,
-                    plot_range=plot_position_function_range,
-                    cmap_range=plot_position_function_cmap_range,
-                    cmap_alpha=plot_position_function_cmap_alpha,
-                    cmap_name=plot_position_function_cmap_name,
-                )
-            )
+        for entity in self.world.entities:
+            geoms += entity.render(env_index=env_index)
+        return geoms
 
-        from vmas.simulator.rendering import Grid
+    def render_batch(
+        self,
+        env_index: Optional[Union[int, Sequence[int], Tensor]] = None,
+        agent_index_focus: int = None,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        render_lidar: bool = True,
+    ) -> Tensor:
+        """
+        Render many environments at once with the headless torch rasterizer.
 
-        if self.scenario.plot_grid:
-            grid = Grid(spacing=self.scenario.grid_spacing)
-            grid.set_color(*vmas.simulator.utils.Color.BLACK.value, alpha=0.3)
-            self.viewer.add_onetime(grid)
+        This does not need pyglet, OpenGL or a display, and draws all the requested environments in one
+        vectorized call. Only the world entities, their sensors and action forces, the grid and the world boundaries
+        are drawn: :meth:`~vmas.simulator.scenario.BaseScenario.extra_render` geometries and comm messages are not.
 
-        self.viewer.add_onetime_list(self.scenario.extra_render(env_index))
+        :param env_index: Indices of the environments to render. If None, all environments are rendered
+        :param agent_index_focus: If specified the camera will stay on the agent with this index. If None, the camera will stay in the center and zoom out to contain all agents
+        :param width: Width of the frames in pixels. Defaults to the scenario viewer width
+        :param height: Height of the frames in pixels. Defaults to the scenario viewer height
+        :param render_lidar: Whether to draw the agents' lidar rays
+        :return: Uint8 tensor of shape (n_envs, height, width, 3) on the environment device
 
-        for entity in self.world.entities:
-            self.viewer.add_onetime_list(entity.render(env_index=env_index))
+        """
+        from vmas.simulator.rasterizer import Rasterizer
 
-        # render to display or array
-        return self.viewer.render(return_rgb_array=mode == "rgb_array")
+        if env_index is None:
+            env_index = torch.arange(self.num_envs, device=self.device)
+        else:
+            env_index = torch.as_tensor(
+                env_index, device=self.device, dtype=torch.long
+            ).view(-1)
+        assert (
+            (env_index >= 0) & (env_index < self.num_envs)
+        ).all(), f"Index must be between 0 and {self.num_envs}, got {env_index}"
+        if agent_index_focus is not None:
+            assert 0 <= agent_index_focus < self.n_agents, (
+                f"Agent focus in rendering should be a valid agent index"
+                f" between 0 and {self.n_agents}, got {agent_index_focus}"
+            )
+        width = width if width is not None else self.scenario.viewer_size[X]
+        height = height if height is not None else self.scenario.viewer_size[Y]
+
+        if (
+            self._rasterizer is None
+            or self._rasterizer.width != width
+            or self._rasterizer.height != height
+        ):
+            self._rasterizer = Rasterizer(width, height, device=self.device)
+
+        bounds = self._get_camera_bounds(
+            env_index, agent_index_focus, aspect_ratio=width / height
+        )
+        return self._rasterizer.render(
+            self.world,
+            env_index,
+            bounds,
+            plot_grid=self.scenario.plot_grid,
+            grid_spacing=self.scenario.grid_spacing,
+            boundary_segments=(
+                self._get_boundary_segments()
+                if self.scenario.visualize_semidims
+                else ()
+            ),
+            render_lidar=render_lidar,
+        )
 
     def plot_boundary(self):
         # include boundaries in the rendering if the environment is dimension-limited
-        if self.world.x_semidim is not None or self.world.y_semidim is not None:
-            from vmas.simulator.rendering import Line
-            from vmas.simulator.utils import Color
+        self.viewer.add_onetime_list(self._get_boundary_geoms())
 
-            # set a big value for the cases where the environment is dimension-limited only in one coordinate
-            infinite_value = 100
-
-            x_semi = (
-                self.world.x_semidim
-                if self.world.x_semidim is not None
-                else infinite_value
-            )
-            y_semi = (
-                self.world.y_semidim
-                if self.world.y_semidim is not None
-                else infinite_value
-            )
+    def _get_boundary_geoms(self) -> List:
+        from vmas.simulator.rendering import Line
+        from vmas.simulator.utils import Color
 
+        # The world semidims do not change, so the lines are built once
+        if self._boundary_geoms is None:
             # set the color for the boundary line
             color = Color.GRAY.value
 
-            # Define boundary points based on whether world semidims are provided
-            if (
-                self.world.x_semidim is not None and self.world.y_semidim is not None
-            ) or self.world.y_semidim is not None:
-                boundary_points = [
-                    (-x_semi, y_semi),
-                    (x_semi, y_semi),
-                    (x_semi, -y_semi),
-                    (-x_semi, -y_semi),
-                ]
-            else:
-                boundary_points = [
-                    (-x_semi, y_semi),
-                    (-x_semi, -y_semi),
-                    (x_semi, y_semi),
-                    (x_semi, -y_semi),
-                ]
+            self._boundary_geoms = []
+            for start, end in self._get_boundary_segments():
+                line = Line(start, end, width=0.7)
+                line.set_color(*color)
+                self._boundary_geoms.append(line)
+        return self._boundary_geoms
+
+    def _get_boundary_segments(self) -> List[Tuple[Tuple[float, float], ...]]:
+        """Returns the ``(start, end)`` points of the world boundary lines"""
+        if self.world.x_semidim is None and self.world.y_semidim is None:
+            return []
+
+        # set a big value for the cases where the environment is dimension-limited only in one coordinate
+        infinite_value = 100
+
+        x_semi = (
+            self.world.x_semidim if self.world.x_semidim is not None else infinite_value
+        )
+        y_semi = (
+            self.world.y_semidim if self.world.y_semidim is not None else infinite_value
+        )
 
-            # Create lines by connecting points
+        # Define boundary points based on whether world semidims are provided
+        if (
+            self.world.x_semidim is not None and self.world.y_semidim is not None
+        ) or self.world.y_semidim is not None:
+            boundary_points = [
+                (-x_semi, y_semi),
+                (x_semi, y_semi),
+                (x_semi, -y_semi),
+                (-x_semi, -y_semi),
+            ]
+        else:
+            boundary_points = [
+                (-x_semi, y_semi),
+                (-x_semi, -y_semi),
+                (x_semi, y_semi),
+                (x_semi, -y_semi),
+            ]
+
+        # Create lines by connecting points
+        return [
+            (boundary_points[i], boundary_points[(i + 1) % len(boundary_points)])
             for i in range(
                 0,
                 len(boundary_points),
@@ -979,17 +1135,87 @@ class Environment(TorchVectorizedObject):
                     and self.world.y_semidim is not None
                 )
                 else 2,
-            ):
-                start = boundary_points[i]
-                end = boundary_points[(i + 1) % len(boundary_points)]
-                line = Line(start, end, width=0.7)
-                line.set_color(*color)
-                self.viewer.add_onetime(line)
+            )
+        ]
+
+    def _get_camera_bounds(
+        self,
+        env_index: Tensor,
+        agent_index_focus: Optional[int] = None,
+        aspect_ratio: Optional[float] = None,
+    ) -> Tensor:
+        """Computes the camera bounds for a batch of environments
+
+        Args:
+            env_index (Tensor): Long tensor of shape ``(B,)`` with the environment indices
+            agent_index_focus (int, optional): If specified the camera is centered on the agent with this index.
+                If None, the camera stays in the render origin and zooms out to contain all agents.
+            aspect_ratio (float, optional): Width over height of the frame. Defaults to the scenario viewer size ratio.
+
+        Returns:
+            Tensor of shape ``(B, 4)`` with the ``(left, right, bottom, top)`` bounds of each environment
+
+        """
+        if self.scenario.viewer_zoom <= 0:
+            raise ValueError("Scenario viewer zoom must be > 0")
+        zoom = self.scenario.viewer_zoom
+        if aspect_ratio is None:
+            aspect_ratio = self.scenario.viewer_size[X] / self.scenario.viewer_size[Y]
+
+        if aspect_ratio < 1:
+            cam_range = torch.tensor([zoom, zoom / aspect_ratio], device=self.device)
+        else:
+            cam_range = torch.tensor([zoom * aspect_ratio, zoom], device=self.device)
+
+        if agent_index_focus is None:
+            # zoom out to fit everyone
+            origin = torch.tensor(
+                self.scenario.render_origin, device=self.device, dtype=torch.float32
+            )
+            all_poses = torch.stack(
+                [agent.state.pos[env_index] for agent in self.world.agents],
+                dim=1,
+            )
+            max_agent_radius = max(
+                [agent.shape.circumscribed_radius() for agent in self.world.agents]
+            )
+            viewer_size_fit = (
+                torch.abs(all_poses - origin).max(dim=1).values + 2 * max_agent_radius
+            )
+            viewer_size = torch.maximum(
+                viewer_size_fit / cam_range,
+                torch.tensor(zoom, device=self.device),
+            )
+            cam_range = cam_range * viewer_size.max(dim=-1, keepdim=True).values
+            center = origin.expand(env_index.shape[0], 2)
+        else:
+            # center around agent
+            center = self.agents[agent_index_focus].state.pos[env_index]
+            cam_range = cam_range.expand(env_index.shape[0], 2)
+
+        return torch.stack(
+            [
+                center[:, X] - cam_range[:, X],
+                center[:, X] + cam_range[:, X],
+                center[:, Y] - cam_range[:, Y],
+                center[:, Y] + cam_range[:, Y],
+            ],
+            dim=-1,
+        )
 
     def plot_function(
-        self, f, precision, plot_range, cmap_range, cmap_alpha, cmap_name
+        self,
+        f,
+        precision,
+        plot_range,
+        cmap_range,
+        cmap_alpha,
+        cmap_name,
+        version: Optional[Hashable] = None,
+        batched: bool = False,
+        env_index: int = 0,
     ):
-        from vmas.simulator.rendering import render_function_util
+        from vmas.simulator.rendering import FunctionPlotCache
 
         if plot_range is None:
             assert self.viewer.bounds is not None, "Set viewer bounds before plotting"
@@ -1002,13 +1228,19 @@ class Environment(TorchVectorizedObject):
                 ],
             )
 
-        geom = render_function_util(
+        if self._function_plot_cache is None:
+            self._function_plot_cache = FunctionPlotCache()
+        geom = self._function_plot_cache.get(
             f=f,
             precision=precision,
             plot_range=plot_range,
             cmap_range=cmap_range,
             cmap_alpha=cmap_alpha,
             cmap_name=cmap_name,
+            version=version,
+            batched=batched,
+            env_index=env_index,
+            device=self.device,
         )
         return geom
 
@@ -1058,3 +1290,5 @@ class Environment(TorchVectorizedObject):
         device = torch.device(device)
         self.scenario.to(device)
         super().to(device)
+        if self._rasterizer is not None:
+            self._rasterizer.to(device)
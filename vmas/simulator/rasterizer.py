@@ -0,0 +1,390 @@
+"""
+Headless batched software rasterizer
+"""
+
+#  Copyright (c) 2022-2025.
+#  ProrokLab (https://www.proroklab.org/)
+#  All rights reserved.
+
+from typing import Callable, Optional, Sequence, Tuple, Union
+
+import torch
+from torch import Tensor
+
+from vmas.simulator.core import Agent, Box, Entity, Line, Sphere, World
+from vmas.simulator.sensors import Lidar
+from vmas.simulator.utils import Color, X, Y
+
+BACKGROUND_COLOR = (1.0, 1.0, 1.0)
+MIN_LINE_WIDTH = 1.0
+
+
+class Rasterizer:
+    """Pure torch rasterizer for the VMAS shape set.
+
+    Shapes are drawn through their signed distance to the pixel centers, so that
+    many environments can be rendered in one vectorized call without OpenGL or a display.
+    Each shape only touches the pixel window that contains it in the batch.
+    The frames look like the ones produced by :class:`~vmas.simulator.rendering.Viewer`.
+
+    Args:
+        width (int): Width of the frames in pixels
+        height (int): Height of the frames in pixels
+        device (torch.device): Device on which frames are drawn
+
+    """
+
+    def __init__(self, width: int, height: int, device: torch.device):
+        self.width = width
+        self.height = height
+        self.device = device
+
+        # Pixel centers in normalized [0, 1] image coordinates, row 0 is the top of the frame
+        cols = (torch.arange(width, device=device, dtype=torch.float32) + 0.5) / width
+        rows = (torch.arange(height, device=device, dtype=torch.float32) + 0.5) / height
+        self._unit_x = cols
+        self._unit_y = 1 - rows
+
+    def to(self, device: torch.device):
+        self.device = device
+        self._unit_x = self._unit_x.to(device)
+        self._unit_y = self._unit_y.to(device)
+
+    def render(
+        self,
+        world: World,
+        env_index: Tensor,
+        bounds: Tensor,
+        plot_grid: bool = False,
+        grid_spacing: float = 0.1,
+        boundary_segments: Sequence[
+            Tuple[Tuple[float, float], Tuple[float, float]]
+        ] = (),
+        render_lidar: bool = True,
+    ) -> Tensor:
+        """Rasterize the world for a batch of environment indices.
+
+        Args:
+            world (World): The world to draw
+            env_index (Tensor): Long tensor of shape ``(B,)`` with the environment indices to draw
+            bounds (Tensor): Camera bounds of shape ``(B, 4)`` as ``(left, right, bottom, top)``
+            plot_grid (bool, optional): Whether to draw the background grid. Defaults to ``False``.
+            grid_spacing (float, optional): Spacing of the background grid. Defaults to ``0.1``.
+            boundary_segments (Sequence, optional): World boundary segments as ``(start, end)`` points.
+            render_lidar (bool, optional): Whether to draw the lidar rays of the agents. Defaults to ``True``.
+
+        Returns:
+            A uint8 tensor of shape ``(B, H, W, 3)``
+
+        """
+        canvas = _Canvas(self, bounds)
+
+        for start, end in boundary_segments:
+            canvas.draw_segment(
+                torch.tensor(start, device=self.device).expand(canvas.batch, 2),
+                torch.tensor(end, device=self.device).expand(canvas.batch, 2),
+                width=0.7,
+                color=Color.GRAY.value,
+            )
+
+        if plot_grid:
+            canvas.draw_grid(grid_spacing, color=Color.BLACK.value, alpha=0.3)
+
+        for entity in world.entities:
+            self._draw_entity(canvas, entity, env_index)
+            if isinstance(entity, Agent):
+                self._draw_agent_extras(canvas, entity, env_index, render_lidar)
+
+        return (canvas.frame.clamp(0, 1) * 255).to(torch.uint8)
+
+    def _draw_entity(self, canvas: "_Canvas", entity: Entity, env_index: Tensor):
+        pos = entity.state.pos[env_index]
+        rot = entity.state.rot[env_index].squeeze(-1)
+        shape = entity.shape
+        color = _to_color(entity.color, env_index, self.device)
+        mask = entity.is_rendering[env_index]
+
+        if isinstance(shape, Line):
+            direction = torch.stack([torch.cos(rot), torch.sin(rot)], dim=-1)
+            half = direction * shape.length / 2
+            canvas.draw_segment(
+                pos - half, pos + half, width=shape.width, color=color, mask=mask
+            )
+            return
+
+        if isinstance(shape, Sphere):
+
+            def sdf(points):
+                return (
+                    torch.linalg.vector_norm(points - pos.view(-1, 1, 1, 2), dim=-1)
+                    - shape.radius
+                )
+
+        elif isinstance(shape, Box):
+            half_extent = torch.tensor(
+                [shape.length / 2, shape.width / 2], device=self.device
+            )
+
+            def sdf(points):
+                q = _to_local(points, pos, rot).abs() - half_extent
+                outside = torch.linalg.vector_norm(q.clamp(min=0), dim=-1)
+                inside = q.max(dim=-1).values.clamp(max=0)
+                return outside + inside
+
+        else:
+            raise NotImplementedError(
+                f"Shape {shape.__class__.__name__} cannot be rasterized"
+            )
+
+        alpha = entity._alpha if isinstance(entity, Agent) else 1.0
+        radius = shape.circumscribed_radius()
+        # Border drawn like FilledPolygon, half the color at half the alpha
+        canvas.draw(
+            sdf,
+            pos - radius,
+            pos + radius,
+            color=color,
+            alpha=alpha,
+            mask=mask,
+            border_color=color * 0.5,
+            border_alpha=alpha * 0.5,
+        )
+
+    def _draw_agent_extras(
+        self, canvas: "_Canvas", agent: Agent, env_index: Tensor, render_lidar: bool
+    ):
+        mask = agent.is_rendering[env_index]
+        pos = agent.state.pos[env_index]
+
+        if render_lidar:
+            for sensor in agent.sensors:
+                if (
+                    not isinstance(sensor, Lidar)
+                    or not sensor._render
+                    or sensor._last_measurement is None
+                ):
+                    continue
+                angles = sensor._angles[env_index] + agent.state.rot[env_index]
+                dists = sensor._last_measurement[env_index]
+                ends = pos.unsqueeze(1) + dists.unsqueeze(-1) * torch.stack(
+                    [torch.cos(angles), torch.sin(angles)], dim=-1
+                )
+                for ray_end in ends.unbind(1):
+                    canvas.draw_segment(
+                        pos,
+                        ray_end,
+                        width=0.05,
+                        color=(0.0, 0.0, 0.0),
+                        alpha=sensor.alpha,
+                        mask=mask,
+                    )
+                    canvas.draw_circle(
+                        ray_end,
+                        0.01,
+                        color=sensor.render_color,
+                        alpha=sensor.alpha,
+                        mask=mask,
+                    )
+
+        if agent._render_action and agent.state.force is not None:
+            canvas.draw_segment(
+                pos,
+                pos
+                + agent.state.force[env_index]
+                * 10
+                * agent.shape.circumscribed_radius(),
+                width=2,
+                color=_to_color(agent.color, env_index, self.device),
+                mask=mask,
+            )
+
+
+class _Canvas:
+    """A batch of frames being drawn by the :class:`Rasterizer`"""
+
+    def __init__(self, rasterizer: Rasterizer, bounds: Tensor):
+        self.device = rasterizer.device
+        self.width = rasterizer.width
+        self.height = rasterizer.height
+        self.batch = bounds.shape[0]
+
+        left, right, bottom, top = bounds.unbind(-1)
+        self.origin = torch.stack([left, top], dim=-1)
+        self.extent = torch.stack([right - left, top - bottom], dim=-1)
+        self.xs = left.unsqueeze(-1) + rasterizer._unit_x * self.extent[:, X : X + 1]
+        self.ys = bottom.unsqueeze(-1) + rasterizer._unit_y * self.extent[:, Y : Y + 1]
+        # World size of one pixel, used to turn distances into coverage
+        self.pixel = torch.maximum(
+            self.extent[:, X] / self.width, self.extent[:, Y] / self.height
+        ).view(-1, 1, 1)
+
+        self.frame = (
+            torch.tensor(BACKGROUND_COLOR, device=self.device, dtype=torch.float32)
+            .expand(self.batch, self.height, self.width, 3)
+            .clone()
+        )
+
+    def _window(self, low: Tensor, high: Tensor) -> Optional[Tuple[Tensor, Tensor]]:
+        # Per frame pixel window containing the world box [low, high], all windows have the same size
+        scale = torch.tensor([self.width, self.height], device=self.device)
+        start = (
+            torch.stack(
+                [low[:, X] - self.origin[:, X], self.origin[:, Y] - high[:, Y]], dim=-1
+            )
+            / self.extent
+            * scale
+        ).floor() - 2
+        end = (
+            torch.stack(
+                [high[:, X] - self.origin[:, X], self.origin[:, Y] - low[:, Y]], dim=-1
+            )
+            / self.extent
+            * scale
+        ).ceil() + 2
+        start = torch.maximum(start, torch.zeros_like(start))
+        end = torch.minimum(end, scale)
+        n_cols, n_rows = (end - start).max(dim=0).values.tolist()
+        n_cols, n_rows = int(min(n_cols, self.width)), int(min(n_rows, self.height))
+        if n_cols <= 0 or n_rows <= 0:
+            return None
+        # Shift windows back inside the frame so that no pixel is indexed twice
+        start = torch.minimum(
+            start,
+            torch.tensor(
+                [self.width - n_cols, self.height - n_rows], device=self.device
+            ),
+        ).long()
+        rows = start[:, Y : Y + 1] + torch.arange(n_rows, device=self.device)
+        cols = start[:, X : X + 1] + torch.arange(n_cols, device=self.device)
+        return rows, cols
+
+    def _points(self, rows: Tensor, cols: Tensor) -> Tensor:
+        xs = self.xs.gather(1, cols)
+        ys = self.ys.gather(1, rows)
+        return torch.stack(
+            [
+                xs.unsqueeze(1).expand(-1, ys.shape[1], -1),
+                ys.unsqueeze(2).expand(-1, -1, xs.shape[1]),
+            ],
+            dim=-1,
+        )
+
+    def draw(
+        self,
+        sdf: Callable[[Tensor], Tensor],
+        low: Tensor,
+        high: Tensor,
+        color,
+        alpha: float = 1.0,
+        mask: Optional[Tensor] = None,
+        border_color=None,
+        border_alpha: float = 1.0,
+    ):
+        """Blends the shape described by ``sdf`` into the frames.
+
+        ``low`` and ``high`` of shape ``(B, 2)`` bound the shape in world coordinates.
+        """
+        window = self._window(low, high)
+        if window is None:
+            return
+        rows, cols = window
+        dist = sdf(self._points(rows, cols))
+        index = (
+            torch.arange(self.batch, device=self.device).view(-1, 1, 1),
+            rows.unsqueeze(2),
+            cols.unsqueeze(1),
+        )
+        patch = self.frame[index]
+
+        # Fraction of the pixel covered by the shape, this gives anti-aliased edges
+        coverage = (0.5 - dist / self.pixel).clamp(0, 1) * alpha
+        if mask is not None:
+            coverage = coverage * mask.view(-1, 1, 1)
+        patch = _blend(patch, coverage, _to_color(color, None, self.device))
+
+        if border_color is not None:
+            border = (1 - dist.abs() / self.pixel).clamp(0, 1) * border_alpha
+            if mask is not None:
+                border = border * mask.view(-1, 1, 1)
+            patch = _blend(patch, border, _to_color(border_color, None, self.device))
+
+        self.frame[index] = patch
+
+    def draw_circle(self, center: Tensor, radius: float, **kwargs):
+        self.draw(
+            lambda points: torch.linalg.vector_norm(
+                points - center.view(-1, 1, 1, 2), dim=-1
+            )
+            - radius,
+            center - radius,
+            center + radius,
+            **kwargs,
+        )
+
+    def draw_segment(self, start: Tensor, end: Tensor, width: float, **kwargs):
+        # Line widths are in pixels, as in OpenGL
+        half_width = max(width, MIN_LINE_WIDTH) / 2
+        margin = self.pixel.view(-1, 1) * half_width
+        self.draw(
+            lambda points: _segment_distance(points, start, end)
+            - self.pixel * half_width,
+            torch.minimum(start, end) - margin,
+            torch.maximum(start, end) + margin,
+            **kwargs,
+        )
+
+    def draw_grid(self, spacing: float, color, alpha: float):
+        # Same extent as rendering.Grid
+        half_length = 25
+        coverages = []
+        for coords in (self.xs, self.ys):
+            dist = (coords - torch.round(coords / spacing) * spacing).abs()
+            coverage = (1 - dist / self.pixel.view(-1, 1)).clamp(0, 1)
+            coverages.append(coverage)
+        coverage = torch.maximum(
+            coverages[X].unsqueeze(1), coverages[Y].unsqueeze(2)
+        ) * (
+            (self.xs.abs() <= half_length).unsqueeze(1)
+            & (self.ys.abs() <= half_length).unsqueeze(2)
+        )
+        self.frame = _blend(
+            self.frame, coverage * alpha, _to_color(color, None, self.device)
+        )
+
+
+def _to_color(
+    color: Union[Tensor, Sequence[float]], env_index: Optional[Tensor], device
+) -> Tensor:
+    if isinstance(color, Tensor):
+        color = color.to(device, torch.float32)
+        if color.dim() > 1 and env_index is not None:
+            color = color[env_index]
+        return color[..., :3]
+    return torch.tensor(color[:3], device=device, dtype=torch.float32)
+
+
+def _blend(frame: Tensor, coverage: Tensor, color: Tensor) -> Tensor:
+    if color.dim() == 2:
+        color = color.view(-1, 1, 1, 3)
+    return frame + (color - frame) * coverage.unsqueeze(-1)
+
+
+def _to_local(points: Tensor, pos: Tensor, rot: Tensor) -> Tensor:
+    delta = points - pos.view(-1, 1, 1, 2)
+    cos = torch.cos(rot).view(-1, 1, 1)
+    sin = torch.sin(rot).view(-1, 1, 1)
+    return torch.stack(
+        [
+            delta[..., X] * cos + delta[..., Y] * sin,
+            -delta[..., X] * sin + delta[..., Y] * cos,
+        ],
+        dim=-1,
+    )
+
+
+def _segment_distance(points: Tensor, start: Tensor, end: Tensor) -> Tensor:
+    start = start.view(-1, 1, 1, 2)
+    seg = end.view(-1, 1, 1, 2) - start
+    rel = points - start
+    t = ((rel * seg).sum(-1) / (seg * seg).sum(-1).clamp(min=1e-12)).clamp(0, 1)
+    return torch.linalg.vector_norm(rel - seg * t.unsqueeze(-1), dim=-1)
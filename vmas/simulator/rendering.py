@@ -12,7 +12,7 @@ import math
 import os
 import sys
 from itertools import chain
-from typing import Callable, Optional, Tuple, Union
+from typing import Callable, Hashable, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
 import pyglet
@@ -35,6 +35,7 @@ try:
         GL_POINTS,
         GL_POLYGON,
         GL_QUADS,
+        GL_SCISSOR_TEST,
         GL_SRC_ALPHA,
         GL_TRIANGLES,
         glBegin,
@@ -51,10 +52,12 @@ try:
         glPushMatrix,
         glRotatef,
         glScalef,
+        glScissor,
         glTranslatef,
         gluOrtho2D,
         glVertex2f,
         glVertex3f,
+        glViewport,
     )
 except ImportError:
     raise ImportError(
@@ -142,11 +145,7 @@ class Viewer(object):
         self.onetime_geoms.extend(geoms)
 
     def render(self, return_rgb_array=False):
-        glClearColor(1, 1, 1, 1)
-
-        self.window.clear()
-        self.window.switch_to()
-        self.window.dispatch_events()
+        self._begin_frame()
 
         self.transform.enable()
 
@@ -162,6 +161,58 @@ class Viewer(object):
         for text in text_lines:
             text.render()
 
+        return self._end_frame(return_rgb_array)
+
+    def render_tiles(
+        self,
+        tiles: Iterable[Tuple[Tuple[float, float, float, float], torch.Tensor, List]],
+        return_rgb_array=False,
+    ):
+        """Renders several views side by side in one frame, read back with a single framebuffer read.
+
+        Args:
+            tiles: Iterable of ``(viewport, bounds, geoms)``. ``viewport`` is the ``(x, y, width, height)``
+                of the tile in window pixels from the bottom left corner, ``bounds`` the
+                ``(left, right, bottom, top)`` world bounds shown in it and ``geoms`` the geometries to draw.
+                It is consumed lazily, so each tile's geometries can be computed when it is drawn.
+            return_rgb_array (bool): Whether to return the frame as an array
+
+        """
+        self._begin_frame()
+        fb_width, fb_height = self.window.get_framebuffer_size()
+        scale_x, scale_y = fb_width / self.width, fb_height / self.height
+
+        # Clip each tile so that geometries outside of its bounds do not spill into its neighbours
+        glEnable(GL_SCISSOR_TEST)
+        for (x, y, width, height), bounds, geoms in tiles:
+            viewport = (
+                round(x * scale_x),
+                round(y * scale_y),
+                round(width * scale_x),
+                round(height * scale_y),
+            )
+            glViewport(*viewport)
+            glScissor(*viewport)
+            self.set_bounds(*bounds)
+            self.transform.enable()
+            for geom in chain(self.geoms, geoms):
+                # Text is laid out in window coordinates, it has no place in a tile
+                if not isinstance(geom, TextLine):
+                    geom.render()
+            self.transform.disable()
+
+        glDisable(GL_SCISSOR_TEST)
+        glViewport(0, 0, fb_width, fb_height)
+        return self._end_frame(return_rgb_array)
+
+    def _begin_frame(self):
+        glClearColor(1, 1, 1, 1)
+
+        self.window.clear()
+        self.window.switch_to()
+        self.window.dispatch_events()
+
+    def _end_frame(self, return_rgb_array):
         pyglet.gl.glMatrixMode(pyglet.gl.GL_PROJECTION)
         pyglet.gl.glLoadIdentity()
         gluOrtho2D(0, self.width, 0, self.height)
@@ -328,8 +379,8 @@ class Image(Geom):
         self.y = y
         self.scale = scale
         img_shape = img.shape
-        img = img.astype(np.uint8).reshape(-1)
-        tex_data = (pyglet.gl.GLubyte * img.size)(*img)
+        # Copying the raw bytes is much faster than unpacking the array into a ctypes array
+        tex_data = np.ascontiguousarray(img, dtype=np.uint8).tobytes()
         pyg_img = pyglet.image.ImageData(
             img_shape[1],
             img_shape[0],
@@ -433,20 +484,25 @@ class Grid(Geom):
         self.linewidth = LineWidth(width)
         self.length = length
         self.add_attr(self.linewidth)
+        # Vertices are computed once, the grid does not change between frames
+        self.v = []
+        for point in np.arange(-self.length / 2, self.length / 2, self.spacing):
+            point = float(point)
+            self.v += [
+                (point, -self.length / 2),
+                (point, self.length / 2),
+                (-self.length / 2, point),
+                (self.length / 2, point),
+            ]
 
     def set_linewidth(self, x):
         self.linewidth.stroke = x
 
     def render1(self):
-        for point in np.arange(-self.length / 2, self.length / 2, self.spacing):
-            glBegin(GL_LINES)
-            glVertex2f(point, -self.length / 2)
-            glVertex2f(point, self.length / 2)
-            glEnd()
-            glBegin(GL_LINES)
-            glVertex2f(-self.length / 2, point)
-            glVertex2f(self.length / 2, point)
-            glEnd()
+        glBegin(GL_LINES)
+        for p in self.v:
+            glVertex2f(*p)
+        glEnd()
 
 
 def render_function_util(
@@ -461,6 +517,103 @@ def render_function_util(
     cmap_alpha: float = 1.0,
     cmap_name: str = "viridis",
 ):
+    x_min, y_min, pos, shape = _get_function_grid(plot_range, precision)
+
+    outputs = f(pos)
+
+    return _function_to_image(
+        outputs,
+        shape=shape,
+        x_min=x_min,
+        y_min=y_min,
+        precision=precision,
+        cmap_range=cmap_range,
+        cmap_alpha=cmap_alpha,
+        cmap_name=cmap_name,
+    )
+
+
+class FunctionPlotCache:
+    """Caches the evaluation of a position function and the images plotting it.
+
+    The function is evaluated again only when the ``version`` passed to :meth:`get` or any of the
+    plotting parameters change. A ``version`` of ``None`` disables the cache.
+
+    When ``batched`` is set, the function takes a ``(n_points, 2)`` tensor on ``device`` and returns its values
+    for all environments at once, with shape ``(n_envs, n_points)`` or ``(n_envs, n_points, 4)``.
+    The images of the single environments are then built the first time they are requested.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.grid = None
+        self.outputs = None
+        self.images = {}
+
+    def get(
+        self,
+        f: Callable,
+        plot_range: Union[
+            float,
+            Tuple[float, float],
+            Tuple[Tuple[float, float], Tuple[float, float]],
+        ],
+        precision: float = 0.01,
+        cmap_range: Optional[Tuple[float, float]] = None,
+        cmap_alpha: float = 1.0,
+        cmap_name: str = "viridis",
+        version: Optional[Hashable] = None,
+        batched: bool = False,
+        env_index: int = 0,
+        device: Optional[Union[str, torch.device]] = None,
+    ) -> "Image":
+        key = (
+            version,
+            _to_hashable(plot_range),
+            precision,
+            _to_hashable(cmap_range),
+            cmap_alpha,
+            cmap_name,
+            batched,
+            None if batched else env_index,
+        )
+        if version is None or key != self.key:
+            self.grid = _get_function_grid(plot_range, precision)
+            pos = self.grid[2]
+            self.outputs = (
+                f(torch.tensor(pos, dtype=torch.float32, device=device))
+                if batched
+                else f(pos)
+            )
+            self.images = {}
+            self.key = key
+
+        image = self.images.get(env_index)
+        if image is None:
+            x_min, y_min, _, shape = self.grid
+            image = _function_to_image(
+                self.outputs[env_index] if batched else self.outputs,
+                shape=shape,
+                x_min=x_min,
+                y_min=y_min,
+                precision=precision,
+                cmap_range=cmap_range,
+                cmap_alpha=cmap_alpha,
+                cmap_name=cmap_name,
+            )
+            self.images[env_index] = image
+        return image
+
+
+def _to_hashable(x):
+    if isinstance(x, (list, tuple)):
+        return tuple(_to_hashable(y) for y in x)
+    if isinstance(x, torch.Tensor):
+        return _to_hashable(x.tolist())
+    return x
+
+
+def _get_function_grid(plot_range, precision):
     if isinstance(plot_range, int) or isinstance(plot_range, float):
         x_min = -plot_range
         y_min = -plot_range
@@ -483,15 +636,17 @@ def render_function_util(
 
     ygrid, xgrid = np.meshgrid(ypoints, xpoints)
     pos = np.stack((xgrid, ygrid), axis=-1).reshape(-1, 2)
-    pos_shape = pos.shape
+    return x_min, y_min, pos, xgrid.shape
 
-    outputs = f(pos)
 
+def _function_to_image(
+    outputs, shape, x_min, y_min, precision, cmap_range, cmap_alpha, cmap_name
+):
     if isinstance(outputs, torch.Tensor):
         outputs = TorchUtils.to_numpy(outputs)
 
     assert isinstance(outputs, np.ndarray)
-    assert outputs.shape[0] == pos_shape[0]
+    assert outputs.shape[0] == shape[0] * shape[1]
     assert outputs.ndim <= 2
 
     if outputs.ndim == 2 and outputs.shape[1] == 1:
@@ -511,7 +666,7 @@ def render_function_util(
             cmap_name=cmap_name,
         )
 
-    img = outputs.reshape(xgrid.shape[0], xgrid.shape[1], outputs.shape[-1])
+    img = outputs.reshape(shape[0], shape[1], outputs.shape[-1])
 
     img = img * 255
     img = np.transpose(img, (1, 0, 2))
@@ -354,6 +354,8 @@ class BaseScenario(ABC):
 
         The returned list is a list of geometries. It is the user's responsibility to set attributes such as color,
         position and rotation.
+        The geometries are only drawn for the current frame, so they can also be created once and returned again
+        in later calls, updating just their transform and color, like the entities do.
 
         Args:
             env_index (int, optional): index of the environment to render. Defaults to ``0``.
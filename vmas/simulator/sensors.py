@@ -73,6 +73,8 @@ class Lidar(Sensor):
         self._entity_filter = entity_filter
         self._render_color = render_color
         self._alpha = alpha
+        # Ray geometries retained across renders
+        self._render_geoms = None
 
     def to(self, device: torch.device):
         self._angles = self._angles.to(device)
@@ -131,30 +133,37 @@ class Lidar(Sensor):
 
         geoms: List[rendering.Geom] = []
         if self._last_measurement is not None:
-            for angle, dist in zip(
-                self._angles.unbind(1), self._last_measurement.unbind(1)
+            if self._render_geoms is None:
+                self._render_geoms = []
+                for _ in range(self._angles.shape[1]):
+                    ray = rendering.Line((0, 0), (0, 0), width=0.05)
+                    ray_xform = rendering.Transform()
+                    ray.add_attr(ray_xform)
+                    ray_circ = rendering.make_circle(0.01)
+                    circ_xform = rendering.Transform()
+                    ray_circ.add_attr(circ_xform)
+                    self._render_geoms.append((ray, ray_xform, ray_circ, circ_xform))
+
+            pos = self.agent.state.pos[env_index]
+            angles = self._angles[env_index] + self.agent.state.rot.squeeze(-1)[
+                env_index
+            ]
+            dists = self._last_measurement[env_index]
+            circ_pos = pos + torch.stack(
+                [torch.cos(angles), torch.sin(angles)], dim=-1
+            ) * dists.unsqueeze(-1)
+
+            pos = pos.tolist()
+            for (ray, ray_xform, ray_circ, circ_xform), angle, dist, pos_circ in zip(
+                self._render_geoms, angles.tolist(), dists.tolist(), circ_pos.tolist()
             ):
-                angle = angle[env_index] + self.agent.state.rot.squeeze(-1)[env_index]
-                ray = rendering.Line(
-                    (0, 0),
-                    (dist[env_index], 0),
-                    width=0.05,
-                )
-                xform = rendering.Transform()
-                xform.set_translation(*self.agent.state.pos[env_index])
-                xform.set_rotation(angle)
-                ray.add_attr(xform)
+                ray.end = (dist, 0)
+                ray_xform.set_translation(*pos)
+                ray_xform.set_rotation(angle)
                 ray.set_color(r=0, g=0, b=0, alpha=self.alpha)
 
-                ray_circ = rendering.make_circle(0.01)
+                circ_xform.set_translation(*pos_circ)
                 ray_circ.set_color(*self.render_color, alpha=self.alpha)
-                xform = rendering.Transform()
-                rot = torch.stack([torch.cos(angle), torch.sin(angle)], dim=-1)
-                pos_circ = (
-                    self.agent.state.pos[env_index] + rot * dist.unsqueeze(1)[env_index]
-                )
-                xform.set_translation(*pos_circ)
-                ray_circ.add_attr(xform)
 
                 geoms.append(ray)
                 geoms.append(ray_circ)
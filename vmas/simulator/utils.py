@@ -3,6 +3,8 @@
 #  All rights reserved.
 import importlib
 import os
+import queue
+import threading
 import typing
 import warnings
 from abc import ABC, abstractmethod
@@ -104,23 +106,100 @@ class Observer(ABC):
 
 def save_video(name: str, frame_list: List[np.array], fps: int):
     """Requres cv2"""
-    import cv2
-
-    video_name = name + ".mp4"
-
-    # Produce a video
-    video = cv2.VideoWriter(
-        video_name,
-        cv2.VideoWriter_fourcc(*"mp4v"),
-        fps,  # FPS
-        (frame_list[0].shape[1], frame_list[0].shape[0]),
-    )
-    for img in frame_list:
-        img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-        # cv2.imwrite(f"{name}.png", img)
-        # break
-        video.write(img)
-    video.release()
+    with VideoWriter(name, fps=fps) as video:
+        for img in frame_list:
+            video.write(img)
+
+
+class VideoWriter:
+    """Streams rgb frames to an mp4 video, encoding them on a background thread.
+
+    Frames are passed to the encoder through a bounded queue, so memory stays constant
+    however long the recording is and encoding overlaps with the simulation.
+    :meth:`write` only blocks when the encoder is ``max_queue_size`` frames behind.
+    It can be given to :meth:`~vmas.simulator.environment.Environment.render` as ``sink``.
+    Requires cv2.
+
+    Args:
+        name (str): Name of the video, ``".mp4"`` is appended to it
+        fps (float): Frames per second of the video
+        max_queue_size (int, optional): Maximum number of frames waiting to be encoded. Defaults to ``32``.
+
+    Examples:
+        >>> from vmas.simulator.utils import VideoWriter
+        >>> with VideoWriter("waterfall", fps=1 / env.scenario.world.dt) as video:
+        ...     for _ in range(100):
+        ...         env.step(env.get_random_actions())
+        ...         env.render(mode="rgb_array", sink=video)
+
+    """
+
+    def __init__(self, name: str, fps: float, max_queue_size: int = 32):
+        import cv2  # noqa: F401  Fail early if cv2 is missing
+
+        self.video_name = name + ".mp4"
+        self.fps = fps
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._encode, daemon=True)
+        self._thread.start()
+
+    def write(self, frame: Union[np.ndarray, Tensor]):
+        """Queues an rgb frame of shape (height, width, 3) for encoding"""
+        self._check_error()
+        assert not self._closed, "Cannot write to a closed VideoWriter"
+        if isinstance(frame, Tensor):
+            frame = TorchUtils.to_numpy(frame)
+        # The caller may reuse its buffer once write returns
+        self._queue.put(np.array(frame, dtype=np.uint8, copy=True))
+
+    def close(self):
+        """Encodes the remaining frames and releases the video file"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._check_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _check_error(self):
+        if self._error is not None:
+            raise RuntimeError(
+                f"Encoding of {self.video_name} failed"
+            ) from self._error
+
+    def _encode(self):
+        import cv2
+
+        video = None
+        try:
+            while True:
+                img = self._queue.get()
+                if img is None:
+                    break
+                if video is None:
+                    video = cv2.VideoWriter(
+                        self.video_name,
+                        cv2.VideoWriter_fourcc(*"mp4v"),
+                        self.fps,  # FPS
+                        (img.shape[1], img.shape[0]),
+                    )
+                video.write(cv2.cvtColor(img, cv2.COLOR_RGB2BGR))
+        except Exception as e:
+            self._error = e
+            # Keep draining so that a blocked write or close can return
+            while self._queue.get() is not None:
+                pass
+        finally:
+            if video is not None:
+                video.release()
 
 
 def x_to_rgb_colormap(